@@ -0,0 +1,785 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import sqlite3
+import argparse
+import warnings
+import platform
+import subprocess
+import tracemalloc
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import fastf1
+import round_elo as elo
+import session_retrival as sr
+import fixtures
+import database_init
+import get_deg
+
+# ==========================
+# Synthetic rounds (no FastF1/Ergast needed)
+# ==========================
+def synthetic_round(rng, round, grid_size=20, teams=10, nan_grid=0.1, ties=0.05, shared_drives=0, dnf=0.0):
+    """Build a round frame shaped like session_retrival.get_session output; DNFs are classified at the back."""
+    drivers = [f"driver_{i}" for i in range(grid_size)]
+    # 1950s style shared drives: the same driver listed twice in one race
+    drivers += list(rng.choice(drivers, size=shared_drives, replace=False))
+    n = len(drivers)
+
+    grid = (rng.permutation(n) + 1).astype(float)
+    grid[rng.random(n) < nan_grid] = np.nan
+    positions = (rng.permutation(n) + 1).astype(float)
+    tied = rng.random(n) < ties
+    positions[tied] = np.roll(positions, 1)[tied]
+    retired = rng.random(n) < dnf
+    if retired.any():
+        # finishers keep their relative order ahead of every retirement
+        order = np.lexsort((positions, retired))
+        positions[order] = np.arange(1, n + 1)
+
+    return pd.DataFrame({
+        "DriverId": drivers,
+        "FirstName": [d.split("_")[1] for d in drivers],
+        "LastName": "Synthetic",
+        "ConstructorName": [f"team_{int(d.split('_')[1]) % teams}" for d in drivers],
+        "GridPosition": grid,
+        "RacePosition": positions,
+        "Status": np.where(retired, "Retired", "Finished"),
+        "Round": round,
+    })
+
+
+# ==========================
+# Parity: vectorised kernel vs the pair loop
+# ==========================
+def prepare_frame(previous_elo, res, rnd, elo_type):
+    """The frame add_elo_rating hands to calculate_elo: round-1 copied forward, new entrants appended."""
+    if len(previous_elo) == 0:
+        frame = res[["DriverId", "FirstName", "LastName", "ConstructorName", "GridPosition"]].copy()
+        frame[rnd - 1] = 1000
+    else:
+        frame = previous_elo.copy()
+    frame[rnd] = frame[rnd - 1]
+    new_rows, has_new = elo.check_new_drivers(res, previous_elo, elo_type)
+    if has_new:
+        frame = pd.concat([frame, new_rows], ignore_index=True)
+    return frame
+
+
+def check_kernel_parity(seasons=3, rounds=8, seed=0):
+    """Replay synthetic seasons through calculate_elo and calculate_elo_loop and compare every round bit for bit."""
+    rng = np.random.default_rng(seed)
+    checked = 0
+    for season in range(seasons):
+        for elo_type, combined in [("DriverId", False), ("ConstructorName", False), ("DriverId", True)]:
+            frame = pd.DataFrame()
+            for rnd in range(1, rounds + 1):
+                res = synthetic_round(rng, rnd, shared_drives=season % 3)
+                frame = prepare_frame(frame, res, rnd, elo_type)
+                modifiers = None
+                if combined:
+                    teams = res["ConstructorName"].unique()
+                    modifiers = pd.DataFrame({"ConstructorName": teams, rnd: rng.uniform(500, 1500, len(teams))})
+
+                vectorised = elo.calculate_elo(res, elo_type, frame.copy(), rnd, modifiers)
+                looped = elo.calculate_elo_loop(res, elo_type, frame.copy(), rnd, modifiers)
+                if not np.array_equal(vectorised[rnd].to_numpy(dtype=float), looped[rnd].to_numpy(dtype=float)):
+                    raise AssertionError(f"Kernel mismatch: season {season}, round {rnd}, {elo_type}, combined={combined}")
+                frame = vectorised
+                checked += 1
+    print(f"✅ Kernel matches the pair loop on {checked} rounds")
+
+
+def season_elos_frames(results_by_round):
+    """The wide-DataFrame season replay get_season_elos used before RatingStore, via add_elo_rating."""
+    j, m, player_elo = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    for i in range(1, max(results_by_round) + 1):
+        res = results_by_round[i]
+        j = elo.add_elo_rating(0, i, j, "ConstructorName", None, res)
+        m = elo.add_elo_rating(0, i, m, "DriverId", j[["ConstructorName", i]], res)
+        player_elo = elo.add_elo_rating(0, i, player_elo, "DriverId", None, res)
+    return (player_elo, j, m)
+
+
+def synthetic_season(rng, rounds, swap_every=3, team_change_every=0, **kwargs):
+    """
+    Rounds where a seat changes hands every few rounds, so new drivers join mid-season.
+    With team_change_every, a driver also moves to the next team every few rounds
+    (a team's drivers then differ round to round and one team can field three cars).
+    Moves pick grid seats from `teams` onwards, wrapping round small grids, so every
+    requested change happens (reserves in a swapped seat move too).
+    """
+    season = {}
+    teams = kwargs.get("teams", 10)
+    grid_size = kwargs.get("grid_size", 20)
+    if team_change_every and teams < 2:
+        raise ValueError("team_change_every needs at least two teams to move drivers between")
+    for rnd in range(1, rounds + 1):
+        res = synthetic_round(rng, rnd, **kwargs)
+        for swap in range(rnd // swap_every if swap_every else 0):
+            res.loc[res["DriverId"] == f"driver_{swap}", ["DriverId", "FirstName"]] = [f"reserve_{swap}", "reserve"]
+        for change in range(rnd // team_change_every if team_change_every else 0):
+            # row i is driver_i's seat; the driver moves from team_{i % teams} to the next one
+            seat = (teams + change) % grid_size
+            res.loc[seat, "ConstructorName"] = f"team_{(seat % teams + 1) % teams}"
+        season[rnd] = res
+    return season
+
+
+def check_store_parity(rounds=6, seed=1):
+    """compute_season_elos (RatingStore) must reproduce the wide-frame replay for every entrant and round."""
+    rng = np.random.default_rng(seed)
+    season = synthetic_season(rng, rounds)
+    store_tables = elo.compute_season_elos(season)
+    frame_tables = season_elos_frames(season)
+
+    for name, store, frame, key in zip(["driver", "constructor", "combined"], store_tables, frame_tables,
+                                       ["DriverId", "ConstructorName", "DriverId"]):
+        frame = frame.drop_duplicates(subset=[key], keep="first").set_index(key)
+        store = store.set_index(key)
+        cols = list(range(1, rounds + 1))
+        if not np.array_equal(store.loc[frame.index, cols].to_numpy(dtype=float), frame[cols].to_numpy(dtype=float)):
+            raise AssertionError(f"RatingStore mismatch in {name} elo")
+    print(f"✅ RatingStore matches the wide-frame replay over {rounds} rounds")
+
+
+def bench_round(grid_size=20, repeats=20, seed=0):
+    """Time one round of driver Elo through the kernel and through the pair loop."""
+    rng = np.random.default_rng(seed)
+    res = synthetic_round(rng, 1, grid_size=grid_size)
+    frame = res[["DriverId", "FirstName", "LastName", "ConstructorName", "GridPosition"]].copy()
+    frame[0] = 1000
+    frame[1] = frame[0]
+
+    timings = {}
+    for name, fn in [("kernel", elo.calculate_elo), ("loop", elo.calculate_elo_loop)]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn(res, "DriverId", frame.copy(), 1, None)
+        timings[name] = (time.perf_counter() - start) / repeats
+    print(f"{grid_size}-car round: loop {timings['loop']*1000:.1f} ms, "
+          f"kernel {timings['kernel']*1000:.2f} ms ({timings['loop']/timings['kernel']:.0f}x)")
+    return timings
+
+
+def bench_combined_season(rounds=22, seed=0):
+    """Full season of combined Elo: per-pair k_modifiers lookups (loop) vs one modifier vector per round (kernel)."""
+    rng = np.random.default_rng(seed)
+    season = synthetic_season(rng, rounds)
+    j, m, player_elo = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    timings = {"combined loop": 0.0, "combined kernel": 0.0, "driver kernel": 0.0}
+
+    for rnd in range(1, rounds + 1):
+        res = season[rnd]
+        j = elo.add_elo_rating(0, rnd, j, "ConstructorName", None, res)
+        modifiers = j[["ConstructorName", rnd]]
+        frame = prepare_frame(m, res, rnd, "DriverId")
+
+        start = time.perf_counter()
+        elo.calculate_elo_loop(res, "DriverId", frame.copy(), rnd, modifiers)
+        timings["combined loop"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        m = elo.calculate_elo(res, "DriverId", frame.copy(), rnd, modifiers)
+        timings["combined kernel"] += time.perf_counter() - start
+
+        frame = prepare_frame(player_elo, res, rnd, "DriverId")
+        start = time.perf_counter()
+        player_elo = elo.calculate_elo(res, "DriverId", frame.copy(), rnd, None)
+        timings["driver kernel"] += time.perf_counter() - start
+
+    print(f"{rounds}-round season: " + ", ".join(f"{name} {t:.3f}s" for name, t in timings.items()))
+    return timings
+
+
+# ==========================
+# Season suite: per elo type timing + memory, JSON output
+# ==========================
+ENGINES = ["store", "frames"]
+ELO_NAMES = ["constructor", "combined", "driver"]
+
+
+def store_season_steps(season):
+    """compute_season_elos split into (elo type, step) calls, in the order it runs them."""
+    round_count = max(season)
+    driver = elo.RatingStore("DriverId", round_count, ["FirstName", "LastName"])
+    constructor = elo.RatingStore("ConstructorName", round_count)
+    combined = elo.RatingStore("DriverId", round_count, ["FirstName", "LastName"])
+    for rnd in range(1, round_count + 1):
+        res = season[rnd]
+        yield "constructor", lambda: constructor.update(rnd, res)
+        yield "combined", lambda: combined.update(rnd, res, constructor.lookup(res["ConstructorName"]))
+        yield "driver", lambda: driver.update(rnd, res)
+    yield "constructor", constructor.to_frame
+    yield "combined", combined.to_frame
+    yield "driver", driver.to_frame
+
+
+def frames_season_steps(season):
+    """The add_elo_rating path update.py uses; new drivers go through check_new_drivers every round."""
+    frames = {name: pd.DataFrame() for name in ELO_NAMES}
+
+    def step(name, rnd, elo_type, combined):
+        def run():
+            res = season[rnd]
+            modifiers = frames["constructor"][["ConstructorName", rnd]] if combined else None
+            with warnings.catch_warnings():
+                # add_elo_rating assigns into column slices
+                warnings.simplefilter("ignore", pd.errors.SettingWithCopyWarning)
+                frames[name] = elo.add_elo_rating(0, rnd, frames[name], elo_type, modifiers, res)
+        return run
+
+    for rnd in range(1, max(season) + 1):
+        yield "constructor", step("constructor", rnd, "ConstructorName", False)
+        yield "combined", step("combined", rnd, "DriverId", True)
+        yield "driver", step("driver", rnd, "DriverId", False)
+
+
+def run_season(season, engine, trace=False):
+    """Seconds (and peak traced bytes above the starting point) spent in each elo type over one season."""
+    steps = store_season_steps if engine == "store" else frames_season_steps
+    seconds = dict.fromkeys(ELO_NAMES, 0.0)
+    peak = dict.fromkeys(ELO_NAMES, 0)
+    for name, step in steps(season):
+        if trace:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        step()
+        seconds[name] += time.perf_counter() - start
+        if trace:
+            peak[name] = max(peak[name], tracemalloc.get_traced_memory()[1] - before)
+    return seconds, peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(engines=ENGINES, seasons=3, rounds=22, grid_size=20, teams=10, dnf=0.15,
+              swap_every=4, team_change_every=6, shared_drives=0, seed=0):
+    """
+    Time driver, constructor and combined elo over synthetic seasons for each engine.
+    Timing and memory are separate passes, since tracemalloc slows allocation heavy code down.
+    Returns a JSON-serialisable dict.
+    """
+    config = {"seasons": seasons, "rounds": rounds, "grid_size": grid_size, "teams": teams, "dnf": dnf,
+              "swap_every": swap_every, "team_change_every": team_change_every,
+              "shared_drives": shared_drives, "seed": seed}
+    rng = np.random.default_rng(seed)
+    data = [synthetic_season(rng, rounds, swap_every=swap_every, team_change_every=team_change_every,
+                             grid_size=grid_size, teams=teams, dnf=dnf, shared_drives=shared_drives)
+            for _ in range(seasons)]
+
+    results = {}
+    for engine in engines:
+        seconds = dict.fromkeys(ELO_NAMES, 0.0)
+        for season in data:
+            for name, t in run_season(season, engine)[0].items():
+                seconds[name] += t
+
+        peak = dict.fromkeys(ELO_NAMES, 0)
+        tracemalloc.start()
+        try:
+            season_peak = 0
+            for season in data:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                for name, p in run_season(season, engine, trace=True)[1].items():
+                    peak[name] = max(peak[name], p)
+                season_peak = max(season_peak, tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+
+        total_rounds = seasons * rounds
+        results[engine] = {
+            name: {"seconds": round(seconds[name], 6),
+                   "rounds_per_second": round(total_rounds / seconds[name], 2) if seconds[name] else None,
+                   "peak_memory_bytes": int(peak[name])}
+            for name in ELO_NAMES
+        }
+        total = sum(seconds.values())
+        results[engine]["season"] = {"seconds": round(total, 6),
+                                     "rounds_per_second": round(total_rounds / total, 2) if total else None,
+                                     "peak_memory_bytes": int(season_peak)}
+
+    return {
+        "benchmark": "elo_season_suite",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "config": config,
+        "results": results,
+    }
+
+
+def print_suite(report):
+    print(f"Elo suite @ {report['commit']}: {report['config']}")
+    for engine, rows in report["results"].items():
+        for name, row in rows.items():
+            print(f"  {engine:<6} {name:<11} {row['seconds']:>9.3f}s  {row['rounds_per_second']:>9} rounds/s  "
+                  f"peak {row['peak_memory_bytes'] / 1024:>8.1f} KiB")
+
+
+# ==========================
+# Season writes: row-at-a-time vs bulk (database_init)
+# ==========================
+def synthetic_results(rng, rounds=22, **kwargs):
+    """A season shaped like get_sql_session_elos output (session columns + Elo) for the DB writers."""
+    frames = []
+    for rnd, res in synthetic_season(rng, rounds, **kwargs).items():
+        n = len(res)
+        laps = rng.integers(40, 70, n)
+        res = res.assign(
+            DriverUrl=[f"https://example.org/{d}" for d in res["DriverId"]],
+            CountryName="Synthetic",
+            Points=np.maximum(0, 11 - res["RacePosition"].to_numpy()),
+            Laps=laps,
+            RaceTime=pd.to_timedelta(laps * rng.uniform(80, 95, n), unit="s"),
+            Q1=pd.to_timedelta(rng.uniform(78, 82, n), unit="s"),
+            Q2=pd.NaT,
+            Q3=pd.NaT,
+            QualifyingPosition=res["GridPosition"],
+            DriverElo=rng.uniform(800, 1300, n),
+            DriverCombinedElo=rng.uniform(800, 1300, n),
+            ConstructorElo=rng.uniform(800, 1300, n),
+            CircuitLocation=f"Circuit {rnd}",
+        )
+        frames.append(res)
+    return pd.concat(frames, ignore_index=True)
+
+
+def dump_tables(db_file, tables=("Driver", "Constructor", "Race", "Constructor_Race", "Driver_Race", "Latest_Rating")):
+    conn = database_init.sqlite3.connect(db_file)
+    dump = {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in tables}
+    conn.close()
+    return dump
+
+
+def bench_season_write(seasons=3, rounds=22, first_year=2001, seed=0):
+    """Seconds per season for write_season_rowwise vs write_season on a file database; rows must be identical."""
+    rng = np.random.default_rng(seed)
+    data = [(first_year + i, synthetic_results(rng, rounds, team_change_every=5)) for i in range(seasons)]
+    tmp = tempfile.mkdtemp(prefix="f1_write_")
+    saved = database_init.DB_FILE
+    timings, dumps = {}, {}
+    try:
+        for name, writer in [("rowwise", database_init.write_season_rowwise), ("bulk", database_init.write_season)]:
+            database_init.DB_FILE = os.path.join(tmp, f"{name}.db")
+            database_init.reset_tables()
+            conn = database_init.sqlite3.connect(database_init.DB_FILE)
+            start = time.perf_counter()
+            for year, results in data:
+                writer(conn, year, results)
+            # writing the last season again exercises the existing driver / constructor / race paths
+            writer(conn, *data[-1])
+            timings[name] = (time.perf_counter() - start) / (seasons + 1)
+            conn.close()
+            dumps[name] = dump_tables(database_init.DB_FILE)
+    finally:
+        database_init.DB_FILE = saved
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for table in dumps["rowwise"]:
+        if dumps["rowwise"][table] != dumps["bulk"][table]:
+            raise AssertionError(f"write_season rows differ from write_season_rowwise in {table}")
+    print(f"✅ Bulk writer rows match the row-at-a-time writer ({sum(map(len, dumps['bulk'].values()))} rows)")
+    print(f"Season write: rowwise {timings['rowwise']:.3f}s/season, bulk {timings['bulk']:.3f}s/season "
+          f"({timings['rowwise'] / timings['bulk']:.0f}x)")
+    return timings
+
+
+# ==========================
+# FastF1 load profiles (needs network)
+# ==========================
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def bench_load_profiles(year, round, kind="R", profiles=("results", "laps", "full")):
+    """
+    Load one session under each profile into its own empty fastf1 cache and report the
+    cold load time, warm (cached) load time and cache size on disk.
+    """
+    results = {}
+    for profile in profiles:
+        cache_dir = tempfile.mkdtemp(prefix=f"fastf1_{profile}_")
+        try:
+            fastf1.Cache.enable_cache(cache_dir)
+            row = {}
+            for run in ["cold", "warm"]:
+                start = time.perf_counter()
+                sr.load_with_profile(fastf1.get_session(year, round, kind), profile)
+                row[f"{run}_seconds"] = round(time.perf_counter() - start, 3)
+            row["cache_bytes"] = directory_size(cache_dir)
+            results[profile] = row
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    sr._cache_enabled = False  # let the next get_session point fastf1 back at the shared cache
+
+    for profile, row in results.items():
+        print(f"  {year} R{round} {kind} [{profile:<8}] cold {row['cold_seconds']:>7.2f}s  "
+              f"warm {row['warm_seconds']:>6.2f}s  cache {row['cache_bytes'] / 2**20:>7.1f} MiB")
+    return {"benchmark": "fastf1_load_profiles", "year": year, "round": round, "kind": kind, "results": results}
+
+
+def check_ergast_season(year):
+    """Season bulk pull vs the per-round Ergast path: same rounds, columns and values (needs network)."""
+    start = time.perf_counter()
+    bulk = sr.fetch_ergast_season(year)
+    bulk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for rnd, frame in bulk.items():
+        pd.testing.assert_frame_equal(frame.reset_index(drop=True), sr.fetch_session(year, rnd).reset_index(drop=True))
+    print(f"✅ {year}: {len(bulk)} rounds match the per-round path "
+          f"(bulk {bulk_seconds:.1f}s, per round {time.perf_counter() - start:.1f}s)")
+
+
+# ==========================
+# End-to-end backfill against recorded responses (fixtures.py)
+# ==========================
+def bench_backfill(years, fixture_dir=fixtures.FIXTURE_DIR, latency=0.0, jitter=0.0, workers=1):
+    """
+    database_init.backfill into a throwaway database, with every FastF1/Ergast request served
+    from fixture_dir after `latency` seconds. Worker processes inherit the patched backend by fork.
+    """
+    years = list(years)
+    tmp = tempfile.mkdtemp(prefix="f1_backfill_")
+    saved = database_init.DB_FILE, sr.RESULTS_STORE_DIR
+    database_init.DB_FILE = os.path.join(tmp, "f1_data.db")
+    sr.RESULTS_STORE_DIR = os.path.join(tmp, "results_store")
+    try:
+        database_init.reset_tables()
+        with fixtures.use_fixtures(fixture_dir, latency=latency, jitter=jitter):
+            start = time.perf_counter()
+            database_init.backfill(years, workers=workers, min_interval=0, jitter=(0, 0))
+            seconds = time.perf_counter() - start
+
+        conn = database_init.sqlite3.connect(database_init.DB_FILE)
+        rounds, rows = conn.execute("""
+            SELECT COUNT(DISTINCT r.race_id), COUNT(*)
+            FROM Driver_Race dr JOIN Race r ON dr.race_id = r.race_id
+        """).fetchone()
+        conn.close()
+    finally:
+        database_init.DB_FILE, sr.RESULTS_STORE_DIR = saved
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {"benchmark": "backfill_fixtures", "commit": git_commit(), "years": [years[0], years[-1]],
+              "workers": workers, "latency": latency, "jitter": jitter, "seconds": round(seconds, 3),
+              "rounds": rounds, "rows": rows, "rounds_per_second": round(rounds / seconds, 3) if seconds else None}
+    print(f"Backfill {years[0]}-{years[-1]} ({workers} workers, {latency * 1000:.0f} ms latency): "
+          f"{rounds} rounds / {rows} rows in {seconds:.1f}s ({report['rounds_per_second']} rounds/s)")
+    return report
+
+
+# ==========================
+# Dashboard reads while an ingest job writes
+# ==========================
+DASHBOARD_URLS = [
+    "/api/rankings/drivers/elo",
+    "/api/rankings/drivers/elo?season={year}",
+    "/api/rankings/drivers/elo?season={year}&race={round}",
+    "/api/rankings/combined?season={year}",
+    "/api/rankings/drivers/elo/history/{driver_id}",
+    "/api/available_races/{year}",
+]
+
+
+def hammer_writes(db_file, stop_at, hold, gap, counts):
+    """Stand-in for update.py: rewrite a season's Driver_Race rows, sit on the transaction, commit."""
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    # a small page cache makes the writer spill mid-transaction, as a full update.py round does
+    conn.execute("PRAGMA cache_size = 20")
+    year = conn.execute("SELECT MAX(year) FROM Race").fetchone()[0]
+    while time.time() < stop_at:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            UPDATE Driver_Race SET elo = elo, combined_elo = combined_elo
+            WHERE race_id IN (SELECT race_id FROM Race WHERE year >= ?)
+        """, (year - 3,))
+        time.sleep(hold)
+        conn.execute("COMMIT")
+        counts["commits"] += 1
+        time.sleep(gap)
+    conn.close()
+
+
+def bench_concurrent_reads(db_file=database_init.DB_FILE, seconds=5.0, readers=8, hold=0.2, gap=0.05,
+                           configs=(("delete", 0), ("wal", 0), ("wal", 8))):
+    """
+    Hit main.py's Elo endpoints from `readers` threads while a separate process keeps write
+    transactions open on a copy of db_file. Each config is (journal_mode, pool_size); pool
+    size 0 opens a fresh connection per request like the old get_db_connection.
+    """
+    import threading
+    import multiprocessing
+
+    tmp = tempfile.mkdtemp(prefix="f1_concurrency_")
+    copy = os.path.join(tmp, "f1_data.db")
+    shutil.copy(db_file, copy)
+    os.environ["F1_DB_PATH"] = copy
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    import main
+
+    conn = sqlite3.connect(copy)
+    year, rnd = conn.execute("SELECT year, MAX(round) FROM Race WHERE year = (SELECT MAX(year) FROM Race)").fetchone()
+    driver_id = conn.execute("SELECT driver_id FROM Driver_Race ORDER BY race_id DESC LIMIT 1").fetchone()[0]
+    conn.close()
+    urls = [u.format(year=year, round=rnd, driver_id=driver_id) for u in DASHBOARD_URLS]
+
+    results = []
+    try:
+        for journal, pool_size in configs:
+            conn = sqlite3.connect(copy)
+            conn.execute(f"PRAGMA journal_mode = {journal}")
+            conn.close()
+            main.db_pool.close_all()
+            main.db_pool = main.ConnectionPool(copy, size=pool_size)
+
+            manager = multiprocessing.Manager()
+            counts = manager.dict(commits=0)
+            stop_at = time.time() + seconds
+            writer = multiprocessing.Process(target=hammer_writes, args=(copy, stop_at, hold, gap, counts))
+            writer.start()
+
+            latencies, errors = [], []
+
+            def read():
+                client = main.app.test_client()
+                i = 0
+                while time.time() < stop_at:
+                    url = urls[i % len(urls)]
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        errors.append(response.get_json(silent=True) or response.status_code)
+                    i += 1
+
+            threads = [threading.Thread(target=read) for _ in range(readers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            writer.join()
+
+            ms = np.array(latencies) * 1000
+            row = {"journal_mode": journal, "pool_size": pool_size, "requests": len(latencies),
+                   "requests_per_second": round(len(latencies) / seconds, 1), "errors": len(errors),
+                   "p50_ms": round(float(np.percentile(ms, 50)), 2), "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                   "max_ms": round(float(ms.max()), 2), "writer_commits": counts["commits"]}
+            results.append(row)
+            manager.shutdown()
+            print(f"{journal:>6} pool={pool_size:<3} {row['requests']:>6} reqs ({row['requests_per_second']}/s)  "
+                  f"p50 {row['p50_ms']} ms  p99 {row['p99_ms']} ms  max {row['max_ms']} ms  "
+                  f"errors {row['errors']}  writer commits {row['writer_commits']}")
+            if errors:
+                print(f"   e.g. {errors[0]}")
+    finally:
+        main.db_pool.close_all()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {"benchmark": "concurrent_reads", "commit": git_commit(), "readers": readers, "seconds": seconds,
+            "write_hold": hold, "results": results}
+
+
+# ==========================
+# Tyre degradation: vectorised vs driver/stint loop (get_deg)
+# ==========================
+COMPOUNDS = np.array(["SOFT", "MEDIUM", "HARD", "INTERMEDIATE"])
+
+
+def synthetic_laps_session(rng, drivers=20, laps=57, nan_laps=0.03, nan_stints=0.01,
+                           deg=0.05, fuel_effect=0.0, traffic=0.0, sc_laps=()):
+    """
+    Object with .laps / .results shaped like a loaded FastF1 race, for calculate_deg_from_session.
+    Every stint loses `deg` s/lap to its tyres and `fuel_effect` s/lap to the fuel burn; `traffic`
+    is the chance a lap is held up, sc_laps are run slowly under a safety car (TrackStatus '4').
+    """
+    rows = []
+    codes = [f"D{i:02d}" for i in range(drivers)]
+    for code in codes:
+        pits = np.sort(rng.choice(np.arange(2, laps), size=min(int(rng.integers(0, 4)), laps - 2), replace=False))
+        stint_starts = np.r_[1, pits]
+        for stint, (start, end) in enumerate(zip(stint_starts, np.r_[pits, laps + 1]), start=1):
+            compound = rng.choice(COMPOUNDS, p=[0.25, 0.35, 0.35, 0.05])
+            base = rng.uniform(88, 92)
+            for lap in range(start, end):
+                seconds = base + deg * (lap - start) - fuel_effect * (lap - 1) + rng.normal(0, 0.3)
+                seconds += 3.0 if lap == start else 0.0
+                seconds += rng.uniform(1, 3) if rng.random() < traffic else 0.0
+                status = "4" if lap in sc_laps else "1"
+                seconds += 25.0 if status == "4" else 0.0
+                rows.append((code, float(stint), float(lap), compound, seconds, status,
+                             stint > 1 and lap == start, lap == end - 1 and end <= laps))
+    frame = pd.DataFrame(rows, columns=["Driver", "Stint", "LapNumber", "Compound", "Seconds", "TrackStatus",
+                                        "PitOut", "PitIn"])
+    frame = frame.sample(frac=1, random_state=int(rng.integers(1 << 31))).reset_index(drop=True)
+    frame.loc[rng.random(len(frame)) < nan_laps, "Seconds"] = np.nan
+    frame.loc[rng.random(len(frame)) < nan_stints, "Stint"] = np.nan
+    frame["LapTime"] = pd.to_timedelta(frame.pop("Seconds"), unit="s")
+    frame["PitOutTime"] = pd.to_timedelta(np.where(frame.pop("PitOut"), 3600.0, np.nan), unit="s")
+    frame["PitInTime"] = pd.to_timedelta(np.where(frame.pop("PitIn"), 3600.0, np.nan), unit="s")
+    results = pd.DataFrame({"Abbreviation": codes, "FirstName": codes, "LastName": [c.lower() for c in codes]})
+    return SimpleNamespace(laps=frame, results=results)
+
+
+def check_deg_parity(sessions=50, seed=0, recorded=()):
+    """calculate_deg_from_session must return exactly the loop version's frame (values, order and index)."""
+    rng = np.random.default_rng(seed)
+    cases = [synthetic_laps_session(rng, drivers=int(rng.integers(1, 22)), laps=int(rng.integers(3, 70)))
+             for _ in range(sessions)]
+    cases += [get_deg.load_session(year, rnd, kind) for year, rnd, kind in recorded]
+    for session in cases:
+        expected = get_deg.calculate_deg_from_session_loop(session)
+        got = get_deg.calculate_deg_from_session(session)
+        pd.testing.assert_frame_equal(got, expected, check_exact=True, check_index_type=False)
+    print(f"✅ Vectorised degradation matches the loop on {len(cases)} sessions")
+
+
+def check_deg_models(sessions=20, seed=0, deg=0.05, fuel_effects=(0.04, get_deg.FUEL_CORRECTION, 0.08), traffic=0.08):
+    """
+    Error against the true tyre deg for both methods on races with fuel burn, traffic and a safety car.
+    Scored per true fuel effect: the regression subtracts a fixed FUEL_CORRECTION, so the races that
+    burn fuel faster or slower than it show how much a wrong correction costs.
+    """
+    report = {}
+    for fuel_effect in fuel_effects:
+        rng = np.random.default_rng(seed)
+        errors = {method: [] for method in get_deg.DEG_METHODS}
+        for _ in range(sessions):
+            sc_start = int(rng.integers(10, 45))
+            session = synthetic_laps_session(rng, laps=57, deg=deg, fuel_effect=fuel_effect, traffic=traffic,
+                                             sc_laps=range(sc_start, sc_start + 4))
+            for method in get_deg.DEG_METHODS:
+                result = get_deg.calculate_deg_from_session(session, method=method)
+                errors[method].extend(np.abs(result["AvgDegPerLap"].to_numpy(dtype=float) - deg))
+        report[fuel_effect] = {method: {"median_abs_error": float(np.median(e)), "p90_abs_error": float(np.percentile(e, 90))}
+                               for method, e in errors.items()}
+        label = " (= FUEL_CORRECTION)" if fuel_effect == get_deg.FUEL_CORRECTION else ""
+        print(f"fuel effect {fuel_effect} s/lap{label}, |error| vs true {deg} s/lap:")
+        for method, r in report[fuel_effect].items():
+            print(f"  {method:>10}: median {r['median_abs_error']:.4f}, p90 {r['p90_abs_error']:.4f}")
+    return report
+
+
+def bench_deg(repeats=20, seed=0):
+    session = synthetic_laps_session(np.random.default_rng(seed), drivers=20, laps=70)
+    engines = [("loop", get_deg.calculate_deg_from_session_loop), ("vectorised", get_deg.calculate_deg_from_session),
+               ("regression", lambda s: get_deg.calculate_deg_from_session(s, method="regression"))]
+    timings = {}
+    for name, fn in engines:
+        fn(session)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn(session)
+        timings[name] = (time.perf_counter() - start) / repeats
+    print(f"Degradation on a {len(session.laps)}-lap race table: "
+          + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items()))
+    return timings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Elo engine benchmarks on synthetic seasons")
+    parser.add_argument("--engine", choices=ENGINES, action="append", help="engine(s) to time (default: all)")
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=22)
+    parser.add_argument("--grid-size", type=int, default=20)
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--dnf", type=float, default=0.15, help="chance each car retires")
+    parser.add_argument("--swap-every", type=int, default=4, help="a new driver takes a seat every N rounds (0 = never)")
+    parser.add_argument("--team-change-every", type=int, default=6, help="a driver changes team every N rounds (0 = never)")
+    parser.add_argument("--shared-drives", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON ('-' for stdout)")
+    parser.add_argument("--checks", action="store_true", help="also run the parity checks and the pair-loop benchmarks")
+    parser.add_argument("--load-profiles", nargs=2, type=int, metavar=("YEAR", "ROUND"),
+                        help="time FastF1 session loading per profile instead of the Elo suite (needs network)")
+    parser.add_argument("--writes", action="store_true", help="time database_init's season writers instead of the Elo suite")
+    parser.add_argument("--ergast-parity", type=int, metavar="YEAR",
+                        help="compare the pre-2018 season bulk pull against per-round requests (needs network)")
+    parser.add_argument("--backfill", nargs=2, type=int, metavar=("START", "END"),
+                        help="time database_init.backfill against recorded responses in --fixtures")
+    parser.add_argument("--fixtures", default=fixtures.FIXTURE_DIR, help="fixture directory for --backfill")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fixture response")
+    parser.add_argument("--workers", type=int, default=1, help="backfill worker processes")
+    parser.add_argument("--session", default="R", help="session kind for --load-profiles (R, Q, S, FP2, ...)")
+    parser.add_argument("--deg", action="store_true", help="check and time the vectorised tyre degradation engine")
+    parser.add_argument("--deg-session", nargs=3, action="append", metavar=("YEAR", "ROUND", "KIND"), default=[],
+                        help="also check a real session for --deg (works against F1_FIXTURES replays)")
+    parser.add_argument("--concurrency", action="store_true",
+                        help="time API reads against a copy of the database while a writer process holds transactions")
+    parser.add_argument("--readers", type=int, default=8, help="reader threads for --concurrency")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per --concurrency config")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sr.install_ingest_hooks()
+    if args.checks:
+        check_kernel_parity()
+        check_store_parity()
+        bench_round()
+        bench_combined_season()
+
+    if args.writes:
+        bench_season_write(seasons=args.seasons, rounds=args.rounds, seed=args.seed)
+        sys.exit()
+
+    if args.backfill:
+        report = bench_backfill(range(args.backfill[0], args.backfill[1] + 1), args.fixtures,
+                                latency=args.latency, workers=args.workers)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit()
+
+    if args.deg:
+        check_deg_parity(recorded=[(int(y), int(r), k) for y, r, k in args.deg_session])
+        check_deg_models()
+        bench_deg()
+        sys.exit()
+
+    if args.concurrency:
+        report = bench_concurrent_reads(seconds=args.duration, readers=args.readers)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit()
+
+    if args.ergast_parity:
+        check_ergast_season(args.ergast_parity)
+        sys.exit()
+
+    if args.load_profiles:
+        report = bench_load_profiles(*args.load_profiles, kind=args.session)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit()
+
+    report = run_suite(engines=args.engine or ENGINES, seasons=args.seasons, rounds=args.rounds,
+                       grid_size=args.grid_size, teams=args.teams, dnf=args.dnf, swap_every=args.swap_every,
+                       team_change_every=args.team_change_every, shared_drives=args.shared_drives, seed=args.seed)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_suite(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"📄 Report written to {args.json}")
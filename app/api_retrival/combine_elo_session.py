@@ -1,7 +1,6 @@
 import pandas as pd
 import session_retrival as fn1
 import round_elo as fn2
-import fastf1
 import sqlite3
 
 def merge_player_elo_session(elo_tables, session):
@@ -36,19 +35,21 @@ def merge_constructor_elo_session(elo_tables, session):
     return a
 
 def get_sql_session_constructor(year):
-    a = fn2.get_season_elos(year)
+    sessions = fn1.get_season_sessions(year)
+    a = fn2.get_season_elos(year, sessions)
     b = pd.DataFrame()
-    for i in range(1, fn1.get_rounds_count(year)+1):
-        b = pd.concat([b, merge_constructor_elo_session(a, fn1.get_session(year, i))], ignore_index=True)
+    for i in sessions:
+        b = pd.concat([b, merge_constructor_elo_session(a, sessions[i])], ignore_index=True)
     return b
 
 
 
 def get_sql_session_driver(year):
-    a = fn2.get_season_elos(year)
+    sessions = fn1.get_season_sessions(year)
+    a = fn2.get_season_elos(year, sessions)
     b = pd.DataFrame()
-    for i in range(1, fn1.get_rounds_count(year)+1):
-        b = pd.concat([b, merge_player_elo_session(a, fn1.get_session(year, i))], ignore_index=True)
+    for i in sessions:
+        b = pd.concat([b, merge_player_elo_session(a, sessions[i])], ignore_index=True)
     return b
 
 
@@ -85,45 +86,20 @@ def merge_session_elos(elo_tables, session):
 
 
 def get_sql_session_elos(year):
-    elo_tables = fn2.get_season_elos(year)
-    results = pd.DataFrame()
+    # Every round is fetched once and the same frames feed both the Elo replay and the merge
+    sessions = fn1.get_season_sessions(year)
+    if not sessions:
+        return pd.DataFrame()
+    elo_tables = fn2.get_season_elos(year, sessions)
 
-    # Get the full season schedule — no date filtering
-    schedule = fastf1.get_event_schedule(year)
-    schedule["EventDate"] = pd.to_datetime(schedule["EventDate"]).dt.tz_localize(None)
-
-    for _, event in schedule.iterrows():
-        event_name = event["EventName"].lower()
-        rnd = int(event["RoundNumber"])
-
-        # Skip pre-season testing or any event with 'test' in its name
-        if "test" in event_name:
-            print(f"Skipping testing event: {event['EventName']}")
-            continue
-
-        try:
-            session = fn1.get_session(year, rnd)
-        except ValueError as e:
-            print(f"⚠️ Skipping round {rnd} ({event['EventName']}): {e}")
-            continue
-
-        if session is None or session.empty:
-            print(f"⚠️ No session data for round {rnd} ({event['EventName']})")
-            continue
-
-        session_merged = merge_session_elos(elo_tables, session)
-        results = pd.concat([results, session_merged], ignore_index=True)
-
-    return results
+    merged = [merge_session_elos(elo_tables, sessions[rnd]) for rnd in sorted(sessions)]
+    return pd.concat(merged, ignore_index=True)
 
 def get_sql_session_elos_single(year, rnd):
     """Return merged session + elo data for a single round only."""
-    import session_retrival as fn1
-    import round_elo as fn2
-
-    elo_tables = fn2.get_season_elos(year)
-    session = fn1.get_session(year, rnd)
-    return merge_session_elos(elo_tables, session)
+    sessions = fn1.get_season_sessions(year)
+    elo_tables = fn2.get_season_elos(year, sessions)
+    return merge_session_elos(elo_tables, sessions[rnd])
 
 def get_db_elos(year):
     """Recreate elo_tables = (driver, constructor, combined) from the database."""
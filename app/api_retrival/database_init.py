@@ -5,7 +5,14 @@ from fastf1 import utils
 from datetime import datetime
 from fastf1.ergast import Ergast
 from combine_elo_session import get_sql_session_elos
+from session_retrival import get_rounds_count, install_ingest_hooks
+from latest_rating import update_latest_rating
+from migrations import migrate
+from ingest_progress import completed_rounds, season_completed, mark_done
+from elo_replay import drop_checkpoints, FIRST_SEASON
 import random, time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 
 import pandas as pd
@@ -37,6 +44,9 @@ def reset_tables():
     DROP TABLE IF EXISTS Session;
     DROP TABLE IF EXISTS Driver_Race;
     DROP TABLE IF EXISTS Constructor_Race;
+    DROP TABLE IF EXISTS Latest_Rating;
+    DROP TABLE IF EXISTS Ingest_Progress;
+    DROP TABLE IF EXISTS Stint;
 
     CREATE TABLE IF NOT EXISTS Driver (
             driver_id INTEGER PRIMARY KEY,
@@ -110,8 +120,11 @@ def reset_tables():
 
 
     """)
-    conn.commit()
+    # fresh tables: replay every migration on top of them
+    conn.execute("PRAGMA user_version = 0")
+    migrate(conn)
     conn.close()
+    drop_checkpoints(FIRST_SEASON)
 # ==========================
 # Insert helpers
 # ==========================
@@ -256,16 +269,139 @@ def format_quali_time(val):
 # ==========================
 # Populate DB from FastF1
 # ==========================
-def populate_for_season(year):
-    print(f"\n=== Processing {year} season ===")
+def compute_season(year):
+    """Fetch a season and compute its Elo; safe to run in a worker process (no DB access)."""
+    return get_sql_session_elos(year)
+
+
+def write_season(conn, year, results, skip_rounds=()):
+    """
+    Write one season's merged session + Elo rows, one transaction per round. Each round's
+    Ingest_Progress 'write' mark commits with its rows, so an interrupted season resumes at
+    the first unwritten round; rounds in skip_rounds are left alone. Returns rounds written.
+    Same rows and ids as write_season_rowwise: ids come from in-memory maps, new drivers /
+    constructors are inserted in first-seen order, then one executemany per table.
+    """
+    conn.commit()
+    cur = conn.cursor()
 
-    # Get all driver results for the season in one go
-    results = get_sql_session_elos(year)
-    if results.empty:
-        print(f"No results for {year}")
-        return
+    driver_map = dict(cur.execute("SELECT code, driver_id FROM Driver"))
+    constructor_map = {}
+    for constructor_id, name in cur.execute("SELECT constructor_id, name FROM Constructor ORDER BY constructor_id"):
+        constructor_map.setdefault(name, constructor_id)
 
-    conn = sqlite3.connect(DB_FILE)
+    written = 0
+    for round_number, round_df in results.groupby("Round"):
+        round_number = int(round_number)
+        if round_number in skip_rounds:
+            continue
+        rows = round_df.to_dict("records")
+        try:
+            # --- Race: first matching race_id wins (as insert_race's lookup)
+            race_name = rows[0]["EventName"] if "EventName" in results else f"Round {round_number}"
+            circuit = rows[0]["CircuitLocation"] if "CircuitLocation" in results else None
+            race_date = rows[0]["EventDate"] if "EventDate" in results else None
+            print(f"  -> {race_name} (Round {round_number})")
+            cur.execute("""
+                INSERT OR IGNORE INTO Race (year, round, name, circuit, date)
+                VALUES (?, ?, ?, ?, ?)
+            """, (year, round_number, race_name, circuit, race_date))
+            race_id = cur.execute(
+                "SELECT MIN(race_id) FROM Race WHERE year = ? AND round = ?", (year, round_number)
+            ).fetchone()[0]
+
+            # --- Driver / Constructor: insert the ones not seen before, in first-seen order
+            new_drivers, new_constructors = {}, {}
+            for row in rows:
+                code = row.get("DriverId")
+                if code not in driver_map and code not in new_drivers:
+                    first, last = row.get("FirstName"), row.get("LastName")
+                    new_drivers[code] = (
+                        str(code) if code is not None else None,
+                        str(first) if first is not None else None,
+                        str(last) if last is not None else None,
+                        row.get("DriverUrl"),
+                        row.get("CountryName"),
+                    )
+                name = row["ConstructorName"]
+                if name not in constructor_map and name not in new_constructors:
+                    new_constructors[name] = (name,)
+            cur.executemany("""
+                INSERT INTO Driver (code, first_name, last_name, headshot, country)
+                VALUES (?, ?, ?, ?, ?)
+            """, list(new_drivers.values()))
+            cur.executemany("INSERT OR IGNORE INTO Constructor (name) VALUES (?)", list(new_constructors.values()))
+            if new_drivers:
+                driver_map.update(cur.execute(
+                    f"SELECT code, driver_id FROM Driver WHERE code IN ({','.join('?' * len(new_drivers))})",
+                    [values[0] for values in new_drivers.values()],
+                ))
+            if new_constructors:
+                for constructor_id, name in cur.execute(
+                    "SELECT constructor_id, name FROM Constructor WHERE constructor_id > ? ORDER BY constructor_id",
+                    (max(constructor_map.values(), default=0),),
+                ):
+                    constructor_map.setdefault(name, constructor_id)
+
+            # --- Constructor_Race (first row per constructor) and Driver_Race
+            existing = {constructor_id for (constructor_id,) in cur.execute(
+                "SELECT constructor_id FROM Constructor_Race WHERE race_id = ?", (race_id,)
+            )}
+            constructor_race_rows, driver_race_rows = [], []
+            for row in rows:
+                driver_id = driver_map[row.get("DriverId")]
+                constructor_id = constructor_map[row["ConstructorName"]]
+
+                constructor_elo = row.get("ConstructorElo")
+                if constructor_id not in existing:
+                    existing.add(constructor_id)
+                    constructor_race_rows.append(
+                        (constructor_id, race_id, int(constructor_elo) if constructor_elo is not None else None)
+                    )
+
+                driver_race_rows.append((
+                    driver_id, constructor_id, race_id,
+                    safe_int(row.get("GridPosition")),
+                    safe_int(row.get("Laps")),
+                    format_quali_time(row.get("RaceTime")) if "RaceTime" in row else None,
+                    row.get("Status"),
+                    format_quali_time(row.get("Q1")) if "Q1" in row else None,
+                    format_quali_time(row.get("Q2")) if "Q2" in row else None,
+                    format_quali_time(row.get("Q3")) if "Q3" in row else None,
+                    safe_int(row.get("QualifyingPosition")),
+                    safe_int(row.get("RacePosition")),
+                    safe_int(row.get("Points")),
+                    safe_int(row.get("DriverElo")),
+                    safe_int(row.get("DriverCombinedElo")),
+                ))
+            cur.executemany("""
+                INSERT INTO Constructor_Race (constructor_id, race_id, elo)
+                VALUES (?, ?, ?)
+            """, constructor_race_rows)
+            cur.executemany("""
+                INSERT INTO Driver_Race (
+                    driver_id, constructor_id, race_id,
+                    GridPosition, Laps, RaceTime, Status,
+                    Q1, Q2, Q3, qualifying_position,
+                    position, points, elo, combined_elo
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, driver_race_rows)
+
+            update_latest_rating(conn, [race_id])
+            mark_done(conn, year, round_number, "write", len(driver_race_rows))
+            conn.commit()
+        except BaseException:
+            # Ctrl-C included; the maps may hold ids from the rolled back round, so stop here
+            conn.rollback()
+            raise
+        written += 1
+    return written
+
+
+def write_season_rowwise(conn, year, results):
+    """The original row-at-a-time writer (a commit per insert); kept to check write_season against."""
+    race_ids = []
 
     # Group by round to process race info
     for round_number, round_df in results.groupby("Round"):
@@ -276,6 +412,7 @@ def populate_for_season(year):
         print(f"  -> {race_name} (Round {round_number})")
 
         race_id = insert_race(conn, year, round_number, race_name, circuit, race_date)
+        race_ids.append(race_id)
         
         for _, row in round_df.iterrows():
             driver_id = insert_driver(
@@ -297,10 +434,6 @@ def populate_for_season(year):
             q2 = format_quali_time(row.get("Q2")) if "Q2" in row else None
             q3 = format_quali_time(row.get("Q3")) if "Q3" in row else None
 
-            position = row.get("RacePosition")
-            points = row.get("Points")
-            elo = row.get("DriverElo", None)
-
             insert_driver_race(
                 conn, driver_id, constructor_id, race_id,
                 row.get("GridPosition"),
@@ -315,21 +448,139 @@ def populate_for_season(year):
                 row.get("DriverCombinedElo")
             )
 
-    conn.close()
+    update_latest_rating(conn, race_ids)
+    conn.commit()
 
 
+def apply_season(conn, year, results):
+    """
+    Write the rounds of a season the ledger hasn't seen. A past season is marked done as a
+    whole only once every scheduled round has its 'write' mark; rounds get_season_sessions
+    skipped (load errors, no results) leave it open for the next run.
+    """
+    done = completed_rounds(conn, year)
+    written = write_season(conn, year, results, skip_rounds=done)
+    if written:
+        drop_checkpoints(year)
+    rounds = results["Round"].nunique()
+    if year < current_year:
+        try:
+            scheduled = set(range(1, get_rounds_count(year) + 1))
+        except Exception as e:
+            print(f"⚠️ Could not read the {year} schedule, season left open: {e}")
+            scheduled = None
+        missing = sorted(scheduled - completed_rounds(conn, year)) if scheduled else None
+        if missing:
+            print(f"⚠️ {year}: rounds {missing} not written, season left open")
+        elif scheduled:
+            mark_done(conn, year, 0, "season", len(scheduled))
+            conn.commit()
+    return written, rounds - written
 
 
+def populate_for_season(year):
+    print(f"\n=== Processing {year} season ===")
+    install_ingest_hooks()
+    conn = sqlite3.connect(DB_FILE)
+    migrate(conn, verbose=False)
+    if season_completed(conn, year):
+        print(f"⏭️ {year} already ingested")
+        conn.close()
+        return
 
+    # Get all driver results for the season in one go
+    results = compute_season(year)
+    if results.empty:
+        print(f"No results for {year}")
+        conn.close()
+        return
 
-if __name__ == "__main__":
-    #reset_tables()
-    
-    """for yr in range(2025, current_year+1):
-        populate_for_season(yr)
-        print(f"Populated data for {yr} season.")
-        time.sleep(20 + random.uniform(0.5, 2.0))  # 30-32s pause"""
+    written, skipped = apply_season(conn, year, results)
+    print(f"✅ {year}: {written} rounds written, {skipped} already in the database")
+    conn.close()
 
-    
-    populate_for_season(2022)
-    print(f"Populated data for {yr} season.")
\ No newline at end of file
+
+# ==========================
+# Parallel backfill
+# ==========================
+def backfill(years, workers=4, min_interval=0.0, jitter=(0.0, 0.0)):
+    """
+    Populate many seasons at once.
+    - worker processes fetch + compute Elo for one season each (seasons are independent, Elo resets yearly)
+    - this process is the only writer to f1_data.db, applying seasons as they finish
+    - requests are paced by the shared token bucket in prefetch.py (429s back off there),
+      so seasons start back to back; min_interval / jitter add optional gaps between starts
+    - resumable: finished seasons are skipped and each round commits with its Ingest_Progress
+      mark, so rerunning after a crash or Ctrl-C only writes what is missing
+    """
+    years = list(years)
+    conn = sqlite3.connect(DB_FILE)
+    migrate(conn, verbose=False)
+    # resume: seasons the ledger has as finished are not fetched again
+    ingested = [yr for yr in years if season_completed(conn, yr)]
+    if ingested:
+        print(f"⏭️ Skipping {len(ingested)} season(s) already ingested: {', '.join(map(str, ingested))}")
+    years = [yr for yr in years if yr not in ingested]
+    total = len(years)
+    done_count = 0
+
+    install_ingest_hooks()
+    with ProcessPoolExecutor(max_workers=workers, initializer=install_ingest_hooks) as pool:
+        running = {}
+        next_start = time.monotonic()
+
+        while years or running:
+            now = time.monotonic()
+            while years and len(running) < workers and now >= next_start:
+                yr = years.pop(0)
+                running[pool.submit(compute_season, yr)] = (yr, now)
+                print(f"⏳ {yr} season started ({len(running)} running)")
+                next_start = now + min_interval + random.uniform(*jitter)
+
+            timeout = None
+            if years and len(running) < workers:
+                timeout = max(0.0, next_start - time.monotonic())
+            finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                yr, started = running.pop(future)
+                done_count += 1
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"❌ [{done_count}/{total}] {yr} failed: {e}")
+                    continue
+                if results.empty:
+                    print(f"⚠️ [{done_count}/{total}] No results for {yr}")
+                    continue
+
+                fetched = time.monotonic() - started
+                write_start = time.monotonic()
+                try:
+                    written, skipped = apply_season(conn, yr, results)
+                except Exception as e:
+                    # e.g. database locked: this season's open round is rolled back, the others carry on
+                    conn.rollback()
+                    print(f"❌ [{done_count}/{total}] {yr} write failed: {e}")
+                    continue
+                print(
+                    f"✅ [{done_count}/{total}] {yr}: {written} rounds written"
+                    + (f", {skipped} already done" if skipped else "")
+                    + f" (fetch + elo {fetched:.1f}s, write {time.monotonic() - write_start:.1f}s)"
+                )
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate f1_data.db from FastF1/Ergast.")
+    parser.add_argument("--start", type=int, default=current_year, help="first season to populate")
+    parser.add_argument("--end", type=int, default=current_year, help="last season to populate")
+    parser.add_argument("--workers", type=int, default=1, help="seasons fetched in parallel")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="extra seconds between season starts")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    args = parser.parse_args()
+
+    if args.reset:
+        reset_tables()
+    backfill(range(args.start, args.end + 1), workers=args.workers, min_interval=args.min_interval)
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from ingest_progress import mark_done
+
+# ==========================
+# Writing one round's tyre degradation (Driver_Race.avg_tire_deg_per_lap) and
+# stints (Stint) from get_deg output; shared by new.py's backfill and update.py
+# ==========================
+def driver_lookup(conn):
+    """code -> driver_id, plus (first, last) lowercased -> driver_id for sessions without a DriverId."""
+    by_code, by_name = {}, {}
+    for driver_id, code, first, last in conn.execute("SELECT driver_id, code, first_name, last_name FROM Driver"):
+        by_code[code] = driver_id
+        by_name.setdefault((str(first).strip().lower(), str(last).strip().lower()), driver_id)
+    return by_code, by_name
+
+
+def resolve_driver(record, lookup):
+    by_code, by_name = lookup
+    driver_id = by_code.get(record.get("DriverId"))
+    if driver_id is None:
+        name = (str(record.get("FirstName") or "").strip().lower(), str(record.get("LastName") or "").strip().lower())
+        driver_id = by_name.get(name)
+    return driver_id
+
+
+def optional(value, cast):
+    return None if value is None or pd.isna(value) else cast(value)
+
+
+def write_round_deg(conn, year, rnd, race_id, records, lookup, stints=(), source=None):
+    """
+    One executemany keyed by (race_id, driver_id) for the degradation, the round's stints replaced
+    in another, both committed together with the round's ledger mark. The round is only marked
+    when drivers were updated or no session had usable stints (source None); records that match
+    no Driver row leave it for the next run. Returns drivers updated.
+    """
+    rows = []
+    for r in records:
+        deg = r.get("AvgDegPerLap")
+        driver_id = resolve_driver(r, lookup)
+        if deg is not None and not pd.isna(deg) and driver_id is not None:
+            rows.append((float(deg), race_id, driver_id))
+
+    cur = conn.cursor()
+    driver_race = dict(cur.execute(
+        "SELECT driver_id, MIN(driver_race_id) FROM Driver_Race WHERE race_id = ? GROUP BY driver_id", (race_id,)
+    ))
+    stint_rows = []
+    for s in stints:
+        driver_race_id = driver_race.get(resolve_driver(s, lookup))
+        if driver_race_id is not None:
+            stint_rows.append((
+                driver_race_id, source, int(s["Stint"]), optional(s.get("Compound"), str),
+                optional(s.get("StartLap"), int), optional(s.get("EndLap"), int), optional(s.get("Laps"), int),
+                optional(s.get("DegPerLap"), float), optional(s.get("MeanPace"), float),
+            ))
+
+    try:
+        cur.executemany(
+            "UPDATE Driver_Race SET avg_tire_deg_per_lap = ? WHERE race_id = ? AND driver_id = ?",
+            rows,
+        )
+        cur.execute(
+            "DELETE FROM Stint WHERE driver_race_id IN (SELECT driver_race_id FROM Driver_Race WHERE race_id = ?)",
+            (race_id,),
+        )
+        cur.executemany("""
+            INSERT INTO Stint (driver_race_id, session, stint, compound, start_lap, end_lap, laps, deg_per_lap, mean_pace)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, stint_rows)
+        if rows or source is None:
+            mark_done(conn, year, rnd, "deg", len(rows))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(rows)
@@ -0,0 +1,148 @@
+import sqlite3
+import time
+import itertools
+import numpy as np
+import pandas as pd
+
+from elo_replay import get_season_results
+from round_elo import expected_score_matrix, actual_result_matrix, grid_k_matrix, combined_k_matrix
+
+# ==========================
+# Setup
+# ==========================
+DB_FILE = "app/api_retrival/database/f1_data.db"
+
+# hand-picked values currently hard coded in round_elo
+DEFAULT_PARAMS = {"k": 30, "grid_weight": 1.0, "scale": 400, "combined_weight": 1.0}
+
+
+def param_grid(k=(10, 20, 30, 40, 60), grid_weight=(0.0, 0.5, 1.0, 2.0),
+               scale=(200, 300, 400, 600), combined_weight=(0.0, 0.5, 1.0)):
+    """Cartesian product of candidate values, one row per parameter set."""
+    rows = list(itertools.product(k, grid_weight, scale, combined_weight))
+    return pd.DataFrame(rows, columns=["k", "grid_weight", "scale", "combined_weight"])
+
+
+# ==========================
+# Stored seasons -> per round arrays (shared by every parameter set)
+# ==========================
+def load_rounds(years, conn):
+    """Per season, a list of rounds holding driver/constructor slots, grid, result and pair masks."""
+    seasons = []
+    for year in years:
+        results = get_season_results(conn, year)
+        if results.empty:
+            continue
+        drivers, driver_keys = pd.factorize(results["DriverId"])
+        constructors, constructor_keys = pd.factorize(results["ConstructorName"])
+        results = results.assign(driver_slot=drivers, constructor_slot=constructors)
+
+        rounds = []
+        for _, res in results.groupby("Round"):
+            grid = pd.to_numeric(res["GridPosition"], errors="coerce").to_numpy(dtype=float)
+            positions = pd.to_numeric(res["RacePosition"], errors="coerce").to_numpy(dtype=float)
+            constructor = res["constructor_slot"].to_numpy()
+            actual = actual_result_matrix(positions)
+            # each unordered pair once, only pairs with a decided result
+            scored = np.triu(actual != 0.5, k=1)
+            rounds.append({
+                "driver": res["driver_slot"].to_numpy(),
+                "constructor": constructor,
+                "grid": grid,
+                "actual": actual,
+                "scored": scored,
+                "rival_teams": scored & (constructor[:, None] != constructor[None, :]),
+            })
+        seasons.append((len(driver_keys), len(constructor_keys), rounds))
+    return seasons
+
+
+def pair_log_loss(expected, actual, mask):
+    """Summed log-loss over the masked pairs, one value per parameter set."""
+    p = np.clip(expected[:, mask], 1e-12, 1 - 1e-12)
+    y = actual[mask]
+    return -(y*np.log(p) + (1 - y)*np.log(1 - p)).sum(axis=1)
+
+
+def apply_deltas(ratings, slots, deltas):
+    """Add every entrant's summed pair deltas to its slot; teammates/shared drives share a slot."""
+    onehot = np.zeros((len(slots), ratings.shape[1]))
+    onehot[np.arange(len(slots)), slots] = 1
+    ratings += deltas.sum(axis=2) @ onehot
+
+
+# ==========================
+# Batched replay
+# ==========================
+def evaluate(seasons, params):
+    """
+    Replay every stored season once for all parameter sets together.
+    Ratings are (param sets x entrants) arrays reset to 1000 each season, like
+    get_season_elos; predictions are scored before each round is applied.
+    """
+    count = len(params)
+    k = params["k"].to_numpy(dtype=float)[:, None, None]
+    grid_weight = params["grid_weight"].to_numpy(dtype=float)[:, None, None]
+    scale = params["scale"].to_numpy(dtype=float)[:, None, None]
+    combined_weight = params["combined_weight"].to_numpy(dtype=float)[:, None, None]
+
+    loss = {"driver": np.zeros(count), "constructor": np.zeros(count), "combined": np.zeros(count)}
+    pairs = {"driver": 0, "constructor": 0, "combined": 0}
+
+    for driver_count, constructor_count, rounds in seasons:
+        driver = np.full((count, driver_count), 1000.0)
+        combined = np.full((count, driver_count), 1000.0)
+        constructor = np.full((count, constructor_count), 1000.0)
+
+        for rnd in rounds:
+            actual = rnd["actual"]
+            pair_k = grid_k_matrix(rnd["grid"], k, grid_weight)
+
+            expected = expected_score_matrix(driver[:, rnd["driver"]], scale, exact=False)
+            loss["driver"] += pair_log_loss(expected, actual, rnd["scored"])
+            apply_deltas(driver, rnd["driver"], pair_k*(actual - expected))
+
+            expected = expected_score_matrix(constructor[:, rnd["constructor"]], scale, exact=False)
+            loss["constructor"] += pair_log_loss(expected, actual, rnd["rival_teams"])
+            apply_deltas(constructor, rnd["constructor"], pair_k*(actual - expected))
+
+            expected = expected_score_matrix(combined[:, rnd["driver"]], scale, exact=False)
+            loss["combined"] += pair_log_loss(expected, actual, rnd["scored"])
+            modifier = 1 + combined_weight*(combined_k_matrix(actual, constructor[:, rnd["constructor"]]) - 1)
+            apply_deltas(combined, rnd["driver"], modifier*pair_k*(actual - expected))
+
+            pairs["driver"] += int(rnd["scored"].sum())
+            pairs["constructor"] += int(rnd["rival_teams"].sum())
+            pairs["combined"] += int(rnd["scored"].sum())
+
+    scores = params.copy()
+    for name in loss:
+        scores[f"{name}_log_loss"] = loss[name] / max(pairs[name], 1)
+    return scores
+
+
+def calibrate(years=range(1950, 2026), params=None):
+    """Score every parameter set by mean pairwise log-loss over the stored seasons."""
+    params = param_grid() if params is None else params
+    conn = sqlite3.connect(DB_FILE)
+    start = time.perf_counter()
+    seasons = load_rounds(years, conn)
+    conn.close()
+    loaded = time.perf_counter() - start
+
+    scores = evaluate(seasons, params)
+    round_count = sum(len(rounds) for _, _, rounds in seasons)
+    print(f"Scored {len(params)} parameter sets over {len(seasons)} seasons / {round_count} rounds "
+          f"(load {loaded:.1f}s, replay {time.perf_counter() - start - loaded:.1f}s)")
+    return scores
+
+
+if __name__ == "__main__":
+    scores = calibrate()
+    is_default = np.logical_and.reduce([scores[c] == v for c, v in DEFAULT_PARAMS.items()])
+    for metric in ["driver_log_loss", "constructor_log_loss", "combined_log_loss"]:
+        current = scores.loc[is_default, metric].iloc[0]
+        rank = int((scores[metric] < current).sum()) + 1
+        print(f"\n=== Best by {metric} ===")
+        print(scores.sort_values(metric).head(5).to_string(index=False))
+        print(f"current constants: {current:.5f} (rank {rank} of {len(scores)})")
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from round_elo import RatingStore
+
+# ==========================
+# Setup
+# ==========================
+DB_FILE = "app/api_retrival/database/f1_data.db"
+CHECKPOINT_DIR = "app/api_retrival/database/elo_checkpoints"
+FIRST_SEASON = 1950
+
+ELO_TYPES = [
+    ("driver", "DriverId", ["FirstName", "LastName"]),
+    ("constructor", "ConstructorName", []),
+    ("combined", "DriverId", ["FirstName", "LastName"]),
+]
+
+
+# ==========================
+# Results source
+# ==========================
+def get_season_results(conn, year):
+    """Stored results for one season, named like session_retrival.get_session output."""
+    return pd.read_sql_query(
+        """
+        SELECT r.round AS Round,
+               d.code AS DriverId,
+               d.first_name AS FirstName,
+               d.last_name AS LastName,
+               c.name AS ConstructorName,
+               dr.GridPosition,
+               dr.position AS RacePosition
+        FROM Driver_Race dr
+        JOIN Race r ON dr.race_id = r.race_id
+        JOIN Driver d ON dr.driver_id = d.driver_id
+        JOIN Constructor c ON dr.constructor_id = c.constructor_id
+        WHERE r.year = ?
+        ORDER BY r.round, dr.driver_race_id
+        """,
+        conn,
+        params=(year,),
+    )
+
+
+# ==========================
+# Checkpoints (ratings after each season)
+# ==========================
+def checkpoint_path(year, checkpoint_dir=CHECKPOINT_DIR):
+    return os.path.join(checkpoint_dir, f"{year}.npz")
+
+
+def save_checkpoint(year, stores, checkpoint_dir=CHECKPOINT_DIR):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    arrays = {"year": np.array(year)}
+    for (name, _, _), store in zip(ELO_TYPES, stores):
+        arrays[f"{name}_labels"] = np.array([[str(v) for v in label] for label in store.labels], dtype=str).reshape(store.size, -1)
+        arrays[f"{name}_ratings"] = store.ratings.copy()
+    np.savez_compressed(checkpoint_path(year, checkpoint_dir), **arrays)
+
+
+def load_checkpoint(year, checkpoint_dir=CHECKPOINT_DIR):
+    """Ratings after `year` as (driver, constructor, combined) stores with no rounds of their own."""
+    with np.load(checkpoint_path(year, checkpoint_dir), allow_pickle=False) as data:
+        stores = []
+        for name, elo_type, label_columns in ELO_TYPES:
+            store = RatingStore(elo_type, 0, label_columns)
+            store.restore(data[f"{name}_labels"].tolist(), data[f"{name}_ratings"])
+            stores.append(store)
+    return tuple(stores)
+
+
+def latest_checkpoint(before_year, checkpoint_dir=CHECKPOINT_DIR):
+    """Most recent checkpointed season earlier than `before_year`, or None."""
+    if not os.path.isdir(checkpoint_dir):
+        return None
+    years = [int(f[:-4]) for f in os.listdir(checkpoint_dir) if f.endswith(".npz") and f[:-4].isdigit()]
+    years = [y for y in years if y < before_year]
+    return max(years) if years else None
+
+
+def drop_checkpoints(from_year, checkpoint_dir=CHECKPOINT_DIR):
+    """Delete checkpoints of from_year and later, e.g. after those seasons' results were rewritten."""
+    if not os.path.isdir(checkpoint_dir):
+        return
+    for f in os.listdir(checkpoint_dir):
+        if f.endswith(".npz") and f[:-4].isdigit() and int(f[:-4]) >= from_year:
+            os.remove(os.path.join(checkpoint_dir, f))
+
+
+# ==========================
+# Replay
+# ==========================
+def replay_season(stores, season_results):
+    """Run one season through stores carried over from the previous one; returns the new season's stores."""
+    round_count = int(season_results["Round"].max())
+    driver, constructor, combined = (store.next_season(round_count) for store in stores)
+    rounds = dict(tuple(season_results.groupby("Round")))
+
+    for i in range(1, round_count + 1):
+        res = rounds.get(i)
+        if res is None:
+            for store in (driver, constructor, combined):
+                store.carry_forward(i)
+            continue
+        constructor.update(i, res)
+        combined.update(i, res, constructor.lookup(res["ConstructorName"]))
+        driver.update(i, res)
+
+    return driver, constructor, combined
+
+
+def replay(end_year=None, resume=True, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Replay every stored result from 1950 up to end_year in one pass, carrying
+    ratings across seasons. A checkpoint is written after each finished season
+    (the current one can still gain rounds); with resume=True the replay starts
+    from the latest checkpoint up to end_year.
+    Returns the (driver, constructor, combined) stores of the last season.
+    """
+    current_year = datetime.now().year
+    end_year = end_year or current_year
+    stores = tuple(RatingStore(elo_type, 0, labels) for _, elo_type, labels in ELO_TYPES)
+    start_year = FIRST_SEASON
+
+    if resume:
+        last = latest_checkpoint(end_year + 1, checkpoint_dir)
+        if last is not None:
+            print(f"↩️ Resuming from {last} checkpoint")
+            stores = load_checkpoint(last, checkpoint_dir)
+            start_year = last + 1
+
+    conn = sqlite3.connect(DB_FILE)
+    for year in range(start_year, end_year + 1):
+        season_results = get_season_results(conn, year)
+        if season_results.empty:
+            continue
+        stores = replay_season(stores, season_results)
+        if year < current_year:
+            save_checkpoint(year, stores, checkpoint_dir)
+        print(f"  -> {year}: {int(season_results['Round'].max())} rounds, {stores[0].size} drivers rated")
+    conn.close()
+
+    return stores
+
+
+def get_continuous_season_elos(year, checkpoint_dir=CHECKPOINT_DIR):
+    """Like round_elo.get_season_elos, but every entrant starts the season from their carried-over rating."""
+    stores = replay(year - 1, checkpoint_dir=checkpoint_dir)
+    conn = sqlite3.connect(DB_FILE)
+    season_results = get_season_results(conn, year)
+    conn.close()
+    if season_results.empty:
+        return tuple(store.to_frame() for store in stores)
+    return tuple(store.to_frame() for store in replay_season(stores, season_results))
+
+
+if __name__ == "__main__":
+    driver, constructor, combined = replay()
+    top = driver.to_frame()[["DriverId", "FirstName", "LastName", driver.rounds]]
+    print(top.sort_values(driver.rounds, ascending=False).head(10))
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import random
+import hashlib
+from contextlib import contextmanager
+
+import requests
+from fastf1.req import Cache
+
+# ==========================
+# Offline stand-in for Ergast / F1 live timing
+# ==========================
+# Every FastF1 request (Ergast, live timing, event schedule) goes through
+# fastf1.req.Cache.requests_get / requests_post, so swapping those two is
+# enough to point session loading and fastf1.ergast.Ergast at recorded files.
+#
+#   record:  F1_FIXTURES=app/api_retrival/database/fixtures F1_FIXTURES_RECORD=1 python app/api_retrival/database_init.py --start 2016 --end 2017
+#   replay:  F1_FIXTURES=app/api_retrival/database/fixtures F1_FIXTURES_LATENCY=0.05 python app/api_retrival/database_init.py --start 2016 --end 2017
+FIXTURE_DIR = "app/api_retrival/database/fixtures"
+
+
+class FixtureBackend:
+    """
+    Serves recorded responses from disk, one <sha1>.json (url, params, status, headers)
+    plus <sha1>.body per request. record=True fetches from the real API and saves
+    what it gets. latency (+ up to jitter) seconds are slept per served request,
+    from a seeded rng so runs are repeatable.
+    """
+
+    def __init__(self, fixture_dir=FIXTURE_DIR, latency=0.0, jitter=0.0, record=False, seed=0):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.record = record
+        self.rng = random.Random(seed)
+        self.stats = {"served": 0, "recorded": 0, "missing": 0, "bytes": 0, "latency_seconds": 0.0}
+        self._real_get = None
+        self._real_post = None
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def key(self, method, url, params=None, data=None):
+        params = sorted((params or {}).items())
+        raw = json.dumps([method, url, params, data], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def paths(self, key):
+        base = os.path.join(self.fixture_dir, key)
+        return base + ".json", base + ".body"
+
+    def request(self, method, url, **kwargs):
+        params, data = kwargs.get("params"), kwargs.get("data", kwargs.get("json"))
+        meta_path, body_path = self.paths(self.key(method, url, params, data))
+
+        if self.record:
+            real = self._real_get if method == "GET" else self._real_post
+            response = real(url, **kwargs)
+            self.save(response, url, params, meta_path, body_path)
+            return response
+
+        if not os.path.exists(meta_path):
+            self.stats["missing"] += 1
+            print(f"⚠️ No fixture for {method} {url} {params or ''}")
+            return self.build_response(url, 404, {}, b"", None)
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        self.stats["served"] += 1
+        self.stats["bytes"] += len(body)
+        self.stats["latency_seconds"] += delay
+        return self.build_response(url, meta["status"], meta["headers"], body, meta.get("encoding"))
+
+    def save(self, response, url, params, meta_path, body_path):
+        # only keep what the parsers look at; cookies and dates would make fixtures differ run to run
+        headers = {k: v for k, v in response.headers.items() if k.lower() == "content-type"}
+        with open(body_path, "wb") as f:
+            f.write(response.content)
+        with open(meta_path, "w") as f:
+            json.dump({"url": url, "params": params, "status": response.status_code,
+                       "headers": headers, "encoding": response.encoding}, f, indent=1, default=str)
+        self.stats["recorded"] += 1
+
+    @staticmethod
+    def build_response(url, status, headers, body, encoding):
+        response = requests.Response()
+        response.url = url
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = body
+        response.encoding = encoding
+        return response
+
+    def install(self):
+        """Route Cache.requests_get / requests_post through this backend (also skips fastf1's rate limiting)."""
+        self._real_get, self._real_post = Cache.requests_get, Cache.requests_post
+        backend = self
+        Cache.requests_get = classmethod(lambda cls, url, **kwargs: backend.request("GET", url, **kwargs))
+        Cache.requests_post = classmethod(lambda cls, url, **kwargs: backend.request("POST", url, **kwargs))
+        return self
+
+    def uninstall(self):
+        if self._real_get is not None:
+            Cache.requests_get, Cache.requests_post = self._real_get, self._real_post
+            self._real_get = self._real_post = None
+
+
+@contextmanager
+def use_fixtures(fixture_dir=FIXTURE_DIR, latency=0.0, jitter=0.0, record=False, seed=0, disable_cache=True):
+    """
+    Point FastF1 / Ergast at recorded responses for the duration of the block.
+    disable_cache=True also switches off fastf1's parsed-data cache so every
+    load goes through the backend (what a cold backfill does).
+    """
+    backend = FixtureBackend(fixture_dir, latency, jitter, record, seed).install()
+    if disable_cache:
+        Cache.set_disabled()
+    try:
+        yield backend
+    finally:
+        if disable_cache:
+            Cache.set_enabled()
+        backend.uninstall()
+
+
+_env_backend = None
+
+def install_from_env():
+    """The switch for scripts: F1_FIXTURES=<dir> [F1_FIXTURES_RECORD=1] [F1_FIXTURES_LATENCY=s] [F1_FIXTURES_JITTER=s]."""
+    global _env_backend
+    fixture_dir = os.environ.get("F1_FIXTURES")
+    if not fixture_dir or _env_backend is not None:
+        return _env_backend
+    _env_backend = FixtureBackend(
+        fixture_dir,
+        latency=float(os.environ.get("F1_FIXTURES_LATENCY", 0)),
+        jitter=float(os.environ.get("F1_FIXTURES_JITTER", 0)),
+        record=os.environ.get("F1_FIXTURES_RECORD") == "1",
+    ).install()
+    print(f"🧪 FastF1/Ergast {'recording to' if _env_backend.record else 'served from'} {fixture_dir}")
+    return _env_backend
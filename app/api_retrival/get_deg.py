@@ -1,21 +1,228 @@
 import fastf1
+import numpy as np
 import pandas as pd
 import os
 
+from session_retrival import load_with_profile
+from prefetch import Prefetcher
+
 CACHE_DIR = "fastf1_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
 fastf1.Cache.enable_cache(CACHE_DIR)
 
 
-def load_session(year, round_num, kind):
-    """Load a FastF1 session by round number."""
+def load_session(year, round_num, kind, profile="laps"):
+    """Load a FastF1 session by round number; deg only needs laps + results (see session_retrival.LOAD_PROFILES)."""
     sess = fastf1.get_session(year, round_num, kind)
-    sess.load()
-    return sess
+    return load_with_profile(sess, profile)
+
+
+DEG_COLUMNS = ["Driver", "FirstName", "LastName", "AvgDegPerLap"]
+DEG_METHODS = ("window", "regression")
+RACE_COMPOUNDS = ["MEDIUM", "HARD"]
+MIN_STINT_LENGTH = 3  # lenient to include most drivers
+
+
+def check_method(method):
+    if method not in DEG_METHODS:
+        raise ValueError(f"Unknown degradation method {method!r} (expected one of {DEG_METHODS})")
+
+
+def calculate_deg_from_session(session, is_sprint=False, method="window"):
+    """
+    Compute average tyre degradation per driver from a given session.
+    method="regression" uses the fuel-corrected per-stint fit (regression_deg_from_session).
+    One sort by (Driver, Stint, LapNumber), then every stint's window laps are picked by
+    offset from its first row; sums run in the same order as the loop version, so the
+    numbers are identical to calculate_deg_from_session_loop.
+    """
+    check_method(method)
+    if method == "regression":
+        return regression_deg_from_session(session)
+
+    laps = session.laps
+    drivers = session.results[["Abbreviation", "FirstName", "LastName"]].drop_duplicates()
+
+    # ✅ only use race compounds
+    laps = laps.loc[laps["Compound"].isin(RACE_COMPOUNDS) & laps["LapTime"].notna(),
+                    ["Driver", "Stint", "LapNumber", "LapTime"]]
+    # drivers and stints numbered in order of appearance (the loop's .unique() order);
+    # laps without a stint number never match a stint in the loop either
+    driver_code, driver_names = pd.factorize(laps["Driver"])
+    has_stint = laps["Stint"].notna().to_numpy()
+    laps, driver_code = laps[has_stint], driver_code[has_stint]
+    if laps.empty:
+        return pd.DataFrame(columns=DEG_COLUMNS)
+    stint_code = pd.MultiIndex.from_arrays([driver_code, laps["Stint"].to_numpy()]).factorize()[0]
+    order = np.lexsort((laps["LapNumber"].to_numpy(), stint_code))
+    times = laps["LapTime"].dt.total_seconds().to_numpy()[order]
+    stint_code, driver_code = stint_code[order], driver_code[order]
+
+    starts = np.flatnonzero(np.r_[True, stint_code[1:] != stint_code[:-1]])
+    length = np.diff(np.r_[starts, len(stint_code)])
+    valid = length >= MIN_STINT_LENGTH
+    starts, length = starts[valid], length[valid]
+    stint_driver = driver_code[starts]
+
+    # skip the out lap; short stints → start vs end; long stints → average window method
+    first = starts + 1
+    last = starts + length - 1
+    usable = length - 1
+    long = usable >= 6
+    early = np.where(long, (times[first] + times[np.minimum(first + 1, last)] + times[np.minimum(first + 2, last)]) / 3,
+                     times[first])
+    late = np.where(long, (times[np.maximum(last - 2, first)] + times[np.maximum(last - 1, first)] + times[last]) / 3,
+                    times[last])
+    num_laps = np.where(long, usable - 3, usable - 1)
+    deg_per_lap = np.where(num_laps > 0, (late - early) / np.maximum(num_laps, 1), 0.0)
+
+    # per-driver mean, accumulated stint by stint like sum(all_deg)
+    total = np.zeros(len(driver_names))
+    np.add.at(total, stint_driver, deg_per_lap)
+    count = np.bincount(stint_driver, minlength=len(driver_names))
+    has_deg = count > 0
+    if not has_deg.any():
+        return pd.DataFrame(columns=DEG_COLUMNS)
+
+    df = pd.DataFrame({
+        "Driver": driver_names[has_deg],
+        "AvgDegPerLap": total[has_deg] / count[has_deg],
+    })
+    merged = df.merge(drivers, left_on="Driver", right_on="Abbreviation", how="left")
+    merged = merged[DEG_COLUMNS].sort_values("AvgDegPerLap")
+    return merged
+
+
+# ==========================
+# Regression model
+# ==========================
+FUEL_CORRECTION = 0.06        # s/lap the car gains as fuel burns off (~1.7 kg/lap x ~0.035 s/kg)
+NEUTRALISED_STATUS = "4567"   # TrackStatus codes: 4 SC, 5 red flag, 6 VSC, 7 VSC ending
+MIN_FIT_LAPS = 4
+OUTLIER_MADS = 3.0
+MIN_SPREAD = 0.1              # s; floor on the residual spread so near-perfect stints keep their laps
+
+
+def clean_stint_laps(laps, compounds=RACE_COMPOUNDS):
+    """Laps a stint fit can use: timed, green flag, not the out lap or an in lap (compounds=None keeps all)."""
+    laps = laps[laps["Stint"].notna()]
+    if compounds is not None:
+        laps = laps[laps["Compound"].isin(compounds)]
+    # the first lap of every stint is the out lap (or the standing start)
+    first_lap = laps.groupby(["Driver", "Stint"])["LapNumber"].transform("min")
+    keep = laps["LapTime"].notna() & (laps["LapNumber"] != first_lap)
+    if "PitInTime" in laps:
+        keep &= laps["PitInTime"].isna()
+    if "PitOutTime" in laps:
+        keep &= laps["PitOutTime"].isna()
+    if "TrackStatus" in laps:
+        status = laps["TrackStatus"].fillna("").astype(str)
+        keep &= ~status.str.contains(f"[{NEUTRALISED_STATUS}]")
+    return laps[keep]
+
+
+def group_slopes(x, y, groups, n):
+    """Least-squares slope of y on x for every group at once, from per-group sums."""
+    count = np.bincount(groups, minlength=n)
+    safe = np.maximum(count, 1)
+    x_mean = np.bincount(groups, x, n) / safe
+    y_mean = np.bincount(groups, y, n) / safe
+    dx, dy = x - x_mean[groups], y - y_mean[groups]
+    sxx = np.bincount(groups, dx * dx, n)
+    sxy = np.bincount(groups, dx * dy, n)
+    slope = np.divide(sxy, sxx, out=np.full(n, np.nan), where=sxx > 0)
+    return slope, y_mean - slope * x_mean, count
 
 
-def calculate_deg_from_session(session, is_sprint=False):
-    """Compute average tyre degradation per driver from a given session."""
+def group_median(values, groups, n):
+    order = np.lexsort((values, groups))
+    values, count = values[order], np.bincount(groups, minlength=n)
+    starts = np.r_[0, np.cumsum(count)[:-1]]
+    lo = np.minimum(starts + (count - 1) // 2, len(values) - 1)
+    hi = np.minimum(starts + count // 2, len(values) - 1)
+    return np.where(count > 0, (values[lo] + values[hi]) / 2, np.nan)
+
+
+def fit_stints(laps):
+    """
+    Fit every (Driver, Stint) of already-cleaned laps at once: lap times are fuel corrected to the
+    stint's start weight (FUEL_CORRECTION per lap run), laps more than OUTLIER_MADS robust deviations
+    off their stint's line (traffic, mistakes) are dropped and the stint refitted. Returns one row per
+    stint with at least MIN_FIT_LAPS laps left: Driver, Stint, DegPerLap, FitLaps, MeanPace (raw s).
+    """
+    if laps.empty:
+        return pd.DataFrame(columns=["Driver", "Stint", "DegPerLap", "FitLaps", "MeanPace"])
+    stint_code, stint_keys = pd.MultiIndex.from_arrays([laps["Driver"], laps["Stint"]]).factorize()
+    n = len(stint_keys)
+    x = laps["LapNumber"].to_numpy(dtype=float)
+    seconds = laps["LapTime"].dt.total_seconds().to_numpy()
+    y = seconds + FUEL_CORRECTION * (x - 1)
+
+    slope, intercept, _ = group_slopes(x, y, stint_code, n)
+    residual = np.abs(y - (intercept[stint_code] + slope[stint_code] * x))
+    spread = np.maximum(1.4826 * group_median(residual, stint_code, n), MIN_SPREAD)
+    inlier = ~(residual > OUTLIER_MADS * spread[stint_code])
+    slope, _, count = group_slopes(x[inlier], y[inlier], stint_code[inlier], n)
+    pace = np.bincount(stint_code[inlier], seconds[inlier], n) / np.maximum(count, 1)
+
+    fitted = (count >= MIN_FIT_LAPS) & np.isfinite(slope)
+    return pd.DataFrame({
+        "Driver": stint_keys.get_level_values(0)[fitted],
+        "Stint": stint_keys.get_level_values(1)[fitted],
+        "DegPerLap": slope[fitted],
+        "FitLaps": count[fitted],
+        "MeanPace": pace[fitted],
+    })
+
+
+def regression_deg_from_session(session):
+    """
+    Tyre degradation per driver as the lap-weighted mean of per-stint slopes (s/lap, see fit_stints),
+    on race-compound laps without out / in laps and SC / VSC / red flag laps.
+    """
+    drivers = session.results[["Abbreviation", "FirstName", "LastName"]].drop_duplicates()
+    fits = fit_stints(clean_stint_laps(session.laps))
+    if fits.empty:
+        return pd.DataFrame(columns=DEG_COLUMNS)
+
+    fits["Weighted"] = fits["DegPerLap"] * fits["FitLaps"]
+    per_driver = fits.groupby("Driver", sort=False)[["Weighted", "FitLaps"]].sum()
+    df = pd.DataFrame({
+        "Driver": per_driver.index,
+        "AvgDegPerLap": (per_driver["Weighted"] / per_driver["FitLaps"]).to_numpy(),
+    })
+    merged = df.merge(drivers, left_on="Driver", right_on="Abbreviation", how="left")
+    return merged[DEG_COLUMNS].sort_values("AvgDegPerLap")
+
+
+STINT_COLUMNS = ["Driver", "DriverId", "FirstName", "LastName", "Stint", "Compound",
+                 "StartLap", "EndLap", "Laps", "DegPerLap", "MeanPace"]
+
+
+def stint_summary(session):
+    """
+    One row per (Driver, Stint) of the session, any compound: first / last lap and laps run,
+    plus fit_stints' slope and mean clean lap time (NaN when too few clean laps to fit).
+    """
+    laps = session.laps[session.laps["Stint"].notna()]
+    if laps.empty:
+        return pd.DataFrame(columns=STINT_COLUMNS)
+    summary = laps.groupby(["Driver", "Stint"], sort=False).agg(
+        Compound=("Compound", "first"),
+        StartLap=("LapNumber", "min"),
+        EndLap=("LapNumber", "max"),
+        Laps=("LapNumber", "size"),
+    ).reset_index()
+    fits = fit_stints(clean_stint_laps(laps, compounds=None))
+    summary = summary.merge(fits[["Driver", "Stint", "DegPerLap", "MeanPace"]], on=["Driver", "Stint"], how="left")
+    drivers = session.results[["Abbreviation", "FirstName", "LastName"]].drop_duplicates("Abbreviation")
+    summary = summary.merge(drivers, left_on="Driver", right_on="Abbreviation", how="left")
+    summary = summary.sort_values(["Driver", "Stint"], kind="stable").reset_index(drop=True)
+    return with_driver_ids(summary, session)[STINT_COLUMNS]
+
+
+def calculate_deg_from_session_loop(session, is_sprint=False):
+    """The original driver -> stint loop; kept to check calculate_deg_from_session against."""
     laps = session.laps.copy()
     drivers = session.results[["Abbreviation", "FirstName", "LastName"]].drop_duplicates()
 
@@ -69,20 +276,83 @@ def calculate_deg_from_session(session, is_sprint=False):
     return merged
 
 
-def calculate_tire_degradation(year, round_num):
-    """Get tyre degradation data for a race weekend (priority: Sprint > FP2 > FP3)."""
-    for kind, is_sprint in [("S", True), ("FP2", False), ("FP3", False)]:
+def with_driver_ids(deg, session):
+    """Add the session's DriverId (Ergast id, Driver.code in f1_data.db); None where the session has none."""
+    if "DriverId" not in session.results:
+        return deg.assign(DriverId=None)
+    ids = {
+        abbreviation: driver_id if isinstance(driver_id, str) and driver_id else None
+        for abbreviation, driver_id in zip(session.results["Abbreviation"], session.results["DriverId"])
+    }
+    return deg.assign(DriverId=deg["Driver"].map(ids))
+
+
+class SessionLoadError(Exception):
+    """No candidate session gave stints and at least one failed to load (network, rate limit, ...), so retry later."""
+
+
+# priority order: a sprint is run on race-like fuel and tyres, then the long-run practice sessions
+DEG_SESSIONS = [("S", True), ("FP2", False), ("FP3", False)]
+
+
+def weekend_sessions(year, round_num):
+    """The DEG_SESSIONS this weekend actually has (all of them if the schedule can't be read)."""
+    try:
+        event = fastf1.get_event(year, round_num)
+    except Exception as e:
+        print(f"⚠️ Could not read the schedule for {year} round {round_num}: {e}")
+        return DEG_SESSIONS
+    kinds = []
+    for kind, is_sprint in DEG_SESSIONS:
         try:
-            session = load_session(year, round_num, kind)
-            print(f"✅ Using {kind} session")
-            deg = calculate_deg_from_session(session, is_sprint)
-            if not deg.empty:
-                return deg, kind
-        except Exception as e:
-            print(f"⚠️ Failed to load {kind}: {e}")
+            event.get_session_name(kind)
+        except ValueError:
+            continue
+        kinds.append((kind, is_sprint))
+    return kinds
+
+
+def calculate_tire_degradation(year, round_num, method="window", with_stints=False):
+    """
+    Get tyre degradation data for a race weekend (priority: Sprint > FP2 > FP3); method as calculate_deg_from_session.
+    The weekend's candidate sessions load at once with the laps profile; as soon as the
+    highest-priority one gives usable stints the lower-priority loads are cancelled.
+    with_stints=True also returns that session's stint_summary: (deg, source, stints).
+    Empty results mean every session loaded without usable stints; if none had stints and one
+    failed to load, SessionLoadError is raised instead so callers don't record the round as done.
+    """
+    check_method(method)
+    kinds = weekend_sessions(year, round_num)
+    keys = [(year, round_num, kind) for kind, _ in kinds]
+    prefetcher = Prefetcher(load_session, workers=max(len(kinds), 1)).prefetch(keys)
+    failures = []
+    try:
+        for i, (kind, is_sprint) in enumerate(kinds):
+            try:
+                session = prefetcher.get(keys[i])
+                print(f"✅ Using {kind} session")
+                deg = calculate_deg_from_session(session, is_sprint, method)
+                if not deg.empty:
+                    prefetcher.cancel(keys[i + 1:])
+                    if with_stints:
+                        return with_driver_ids(deg, session), kind, stint_summary(session)
+                    return with_driver_ids(deg, session), kind
+            except ValueError as e:
+                # FastF1's answer for a session this weekend doesn't have
+                print(f"⚠️ No {kind} session: {e}")
+            except Exception as e:
+                print(f"⚠️ Failed to load {kind}: {e}")
+                failures.append(f"{kind}: {e}")
+    finally:
+        # don't wait on cancelled fallbacks still parsing
+        prefetcher.close(wait=False)
 
+    if failures:
+        raise SessionLoadError(f"{year} round {round_num}: " + "; ".join(failures))
     print("❌ No usable session data found for this round.")
-    return pd.DataFrame(columns=["Driver", "FirstName", "LastName", "AvgDegPerLap"]), None
+    if with_stints:
+        return pd.DataFrame(columns=DEG_COLUMNS), None, pd.DataFrame(columns=STINT_COLUMNS)
+    return pd.DataFrame(columns=DEG_COLUMNS), None
 
 
 # -----------------------------
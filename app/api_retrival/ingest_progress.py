@@ -0,0 +1,46 @@
+# ==========================
+# Ingest_Progress: which (year, round, stage) a backfill has finished, so an
+# interrupted run picks up where it stopped instead of writing rounds twice
+# (Driver_Race has no unique key to catch duplicates)
+# ==========================
+# stages:
+#   'write'  - the round's Race / Driver_Race / Constructor_Race rows are committed
+#   'season' - every round of a finished season is written (round = 0)
+#   'deg'    - the round's tyre degradation / stints are written, or its sessions loaded without usable stints
+INGEST_PROGRESS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Ingest_Progress (
+    year INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    rows INTEGER,
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (year, round, stage)
+);
+"""
+
+# rounds written before the ledger existed count as done
+SEED_FROM_DRIVER_RACE = """
+INSERT OR IGNORE INTO Ingest_Progress (year, round, stage, rows)
+SELECT r.year, r.round, 'write', COUNT(*)
+FROM Driver_Race dr
+JOIN Race r ON dr.race_id = r.race_id
+GROUP BY r.year, r.round
+"""
+
+
+def completed_rounds(conn, year, stage="write"):
+    return {rnd for (rnd,) in conn.execute(
+        "SELECT round FROM Ingest_Progress WHERE year = ? AND stage = ?", (year, stage)
+    )}
+
+
+def season_completed(conn, year):
+    return 0 in completed_rounds(conn, year, "season")
+
+
+def mark_done(conn, year, rnd, stage="write", rows=None):
+    """Record a finished stage; runs in the caller's transaction so it commits with the data."""
+    conn.execute("""
+        INSERT INTO Ingest_Progress (year, round, stage, rows) VALUES (?, ?, ?, ?)
+        ON CONFLICT(year, round, stage) DO UPDATE SET rows = excluded.rows, completed_at = CURRENT_TIMESTAMP
+    """, (year, rnd, stage, rows))
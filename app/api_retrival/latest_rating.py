@@ -0,0 +1,99 @@
+import sqlite3
+
+# ==========================
+# Latest_Rating: one row per driver / constructor holding their most recent Elo,
+# so the unfiltered ranking endpoints don't scan the whole Driver_Race history.
+# Created (and first filled) by migration 6 in migrations.py
+# ==========================
+LATEST_RATING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Latest_Rating (
+    entity_type TEXT NOT NULL,          -- 'driver' or 'constructor'
+    entity_id INTEGER NOT NULL,         -- driver_id / constructor_id
+    constructor_id INTEGER,             -- driver's constructor at their latest race
+    race_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    elo INTEGER,
+    combined_elo INTEGER,
+    PRIMARY KEY (entity_type, entity_id),
+    FOREIGN KEY (constructor_id) REFERENCES Constructor(constructor_id),
+    FOREIGN KEY (race_id) REFERENCES Race(race_id)
+);
+CREATE INDEX IF NOT EXISTS idx_latest_rating_elo ON Latest_Rating(entity_type, elo);
+CREATE INDEX IF NOT EXISTS idx_latest_rating_combined ON Latest_Rating(entity_type, combined_elo);
+"""
+
+# newer (year, round) wins; re-writing the same race (e.g. invalidate_from) overwrites it
+UPSERT = """
+    ON CONFLICT(entity_type, entity_id) DO UPDATE SET
+        constructor_id = excluded.constructor_id,
+        race_id = excluded.race_id,
+        year = excluded.year,
+        round = excluded.round,
+        elo = excluded.elo,
+        combined_elo = excluded.combined_elo
+    WHERE excluded.year > Latest_Rating.year
+       OR (excluded.year = Latest_Rating.year AND excluded.round >= Latest_Rating.round)
+"""
+
+
+def refresh_latest_rating(conn):
+    """Rebuild Latest_Rating from Driver_Race / Constructor_Race."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM Latest_Rating")
+    cur.execute("""
+        INSERT INTO Latest_Rating (entity_type, entity_id, constructor_id, race_id, year, round, elo, combined_elo)
+        SELECT 'driver', driver_id, constructor_id, race_id, year, round, elo, combined_elo
+        FROM (
+            SELECT dr.driver_id, dr.constructor_id, dr.race_id, r.year, r.round, dr.elo, dr.combined_elo,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY dr.driver_id ORDER BY r.year DESC, r.round DESC, dr.driver_race_id DESC
+                   ) AS rn
+            FROM Driver_Race dr
+            JOIN Race r ON dr.race_id = r.race_id
+        )
+        WHERE rn = 1
+    """)
+    cur.execute("""
+        INSERT INTO Latest_Rating (entity_type, entity_id, constructor_id, race_id, year, round, elo, combined_elo)
+        SELECT 'constructor', constructor_id, constructor_id, race_id, year, round, elo, NULL
+        FROM (
+            SELECT cr.constructor_id, cr.race_id, r.year, r.round, cr.elo,
+                   ROW_NUMBER() OVER (PARTITION BY cr.constructor_id ORDER BY r.year DESC, r.round DESC) AS rn
+            FROM Constructor_Race cr
+            JOIN Race r ON cr.race_id = r.race_id
+        )
+        WHERE rn = 1
+    """)
+
+
+def update_latest_rating(conn, race_ids):
+    """Fold the given races into Latest_Rating (call after their Elo has been written)."""
+    cur = conn.cursor()
+    for race_id in race_ids:
+        cur.execute("""
+            INSERT INTO Latest_Rating (entity_type, entity_id, constructor_id, race_id, year, round, elo, combined_elo)
+            SELECT 'driver', dr.driver_id, dr.constructor_id, dr.race_id, r.year, r.round, dr.elo, dr.combined_elo
+            FROM Driver_Race dr
+            JOIN Race r ON dr.race_id = r.race_id
+            WHERE dr.race_id = ?
+            ORDER BY dr.driver_race_id
+        """ + UPSERT, (race_id,))
+        cur.execute("""
+            INSERT INTO Latest_Rating (entity_type, entity_id, constructor_id, race_id, year, round, elo, combined_elo)
+            SELECT 'constructor', cr.constructor_id, cr.constructor_id, cr.race_id, r.year, r.round, cr.elo, NULL
+            FROM Constructor_Race cr
+            JOIN Race r ON cr.race_id = r.race_id
+            WHERE cr.race_id = ?
+        """ + UPSERT, (race_id,))
+
+
+if __name__ == "__main__":
+    from migrations import migrate
+
+    conn = sqlite3.connect("app/api_retrival/database/f1_data.db")
+    migrate(conn)
+    refresh_latest_rating(conn)
+    conn.commit()
+    print(f"✅ Latest_Rating rebuilt ({conn.execute('SELECT COUNT(*) FROM Latest_Rating').fetchone()[0]} rows)")
+    conn.close()
@@ -0,0 +1,229 @@
+import os
+import re
+import ast
+import sys
+import sqlite3
+
+from ingest_progress import INGEST_PROGRESS_SCHEMA, SEED_FROM_DRIVER_RACE
+from latest_rating import LATEST_RATING_SCHEMA, refresh_latest_rating
+
+# ==========================
+# Setup
+# ==========================
+DB_FILE = "app/api_retrival/database/f1_data.db"
+MAIN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main.py")
+
+
+# ==========================
+# Migrations
+# ==========================
+# The applied version lives in PRAGMA user_version. Each step runs in its own
+# transaction together with the version bump, so a failed step leaves the
+# database at the previous version and the next run retries it.
+def run_script(conn, script):
+    # executescript would commit mid-way, so run the statements one by one
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def add_deg_column(conn):
+    cols = [c[1] for c in conn.execute("PRAGMA table_info(Driver_Race)")]
+    if "avg_tire_deg_per_lap" not in cols:
+        conn.execute("ALTER TABLE Driver_Race ADD COLUMN avg_tire_deg_per_lap REAL")
+
+
+RACE_PREDICTIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Race_Predictions (
+    prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    year INTEGER NOT NULL,
+    gp_name TEXT NOT NULL,
+    driver_code TEXT NOT NULL,
+    driver_name TEXT,
+    qualifying_time REAL,
+    qualifying_position INTEGER,
+    predicted_race_position INTEGER,
+    tire_deg_rate REAL,
+    prediction_method TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# year/round lookups and the Race <-> Driver_Race / Constructor_Race joins behind every endpoint;
+# the driver index carries elo / combined_elo so per-driver history reads never touch the table
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_race_year_round ON Race(year, round);
+CREATE INDEX IF NOT EXISTS idx_driver_race_race ON Driver_Race(race_id);
+CREATE INDEX IF NOT EXISTS idx_driver_race_driver ON Driver_Race(driver_id, race_id, elo, combined_elo);
+CREATE INDEX IF NOT EXISTS idx_constructor_race_race ON Constructor_Race(race_id);
+CREATE INDEX IF NOT EXISTS idx_race_predictions_year_gp ON Race_Predictions(year, gp_name);
+"""
+
+def add_ingest_progress(conn):
+    conn.execute(INGEST_PROGRESS_SCHEMA)
+    conn.execute(SEED_FROM_DRIVER_RACE)
+
+
+# stints of the session the degradation came from, for strategy charts without reloading FastF1
+STINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Stint (
+    stint_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    driver_race_id INTEGER NOT NULL,
+    session TEXT,                -- FastF1 session the laps come from ('S', 'FP2', 'FP3')
+    stint INTEGER NOT NULL,
+    compound TEXT,
+    start_lap INTEGER,
+    end_lap INTEGER,
+    laps INTEGER,
+    deg_per_lap REAL,            -- fuel-corrected slope, s/lap (NULL if too few clean laps)
+    mean_pace REAL,              -- mean clean lap time, s
+    UNIQUE(driver_race_id, stint),
+    FOREIGN KEY (driver_race_id) REFERENCES Driver_Race(driver_race_id)
+);
+"""
+
+def add_latest_rating(conn):
+    # databases that predate this step may already have the table from the old ad hoc create
+    run_script(conn, LATEST_RATING_SCHEMA)
+    refresh_latest_rating(conn)
+
+
+MIGRATIONS = [
+    (1, "Driver_Race.avg_tire_deg_per_lap", add_deg_column),
+    (2, "Race_Predictions table", RACE_PREDICTIONS_SCHEMA),
+    (3, "year/round and join indexes", INDEXES),
+    (4, "Ingest_Progress ledger", add_ingest_progress),
+    (5, "Stint table", STINT_SCHEMA),
+    (6, "Latest_Rating table", add_latest_rating),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, verbose=True):
+    """
+    Bring the schema up to the latest version; already-applied steps are skipped,
+    so it is safe to call on every start. Commits whatever the caller had open first.
+    Returns the list of versions applied.
+    """
+    conn.commit()
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN")
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                run_script(conn, step)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"🧱 Migration {version}: {description}")
+    # the API's readers never wait on ingest writers in WAL; the mode is stored in the file
+    conn.execute("PRAGMA journal_mode = WAL")
+    return applied
+
+
+# ==========================
+# Query plan report
+# ==========================
+# Queries that live outside main.py but run on every request
+EXTRA_QUERIES = [
+    ("predict_race.get_predictions_from_db",
+     "SELECT * FROM Race_Predictions WHERE year = ? AND gp_name LIKE ? ORDER BY predicted_race_position ASC"),
+]
+
+
+def main_queries(path=MAIN_FILE):
+    """
+    (function name, sql, fallback) for every SELECT string literal in main.py; fallback is
+    True for queries inside an except handler (e.g. used while Latest_Rating is missing).
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    handled = {id(node) for handler in ast.walk(tree) if isinstance(handler, ast.ExceptHandler)
+               for node in ast.walk(handler)}
+    queries = []
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        for node in ast.walk(func):
+            if (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                    and re.match(r"\s*(WITH|SELECT)\b", node.value, re.I) and " FROM " in node.value.upper()):
+                queries.append((func.name, node.value, id(node) in handled))
+    # nested functions are walked twice; keep the innermost name
+    seen, unique = set(), []
+    for name, sql, fallback in reversed(queries):
+        if sql not in seen:
+            seen.add(sql)
+            unique.append((name, sql, fallback))
+    return list(reversed(unique))
+
+
+def full_scans(plan):
+    """
+    Plan lines that read a whole table, directly or through an index with no search key
+    ("SCAN t USING INDEX i"); scans of subqueries / CTEs and the rowid range reads of
+    SEARCH lines don't count.
+    """
+    materialized = {m.group(1) for line in plan for m in [re.match(r"(?:MATERIALIZE|CO-ROUTINE) (\w+)", line)] if m}
+    scans = []
+    for line in plan:
+        m = re.match(r"SCAN (\w+)", line)
+        if m and m.group(1) not in materialized:
+            scans.append(line)
+    return scans
+
+
+def explain_report(conn, path=MAIN_FILE):
+    report = []
+    for name, sql, fallback in main_queries(path) + [(name, sql, False) for name, sql in EXTRA_QUERIES]:
+        entry = {"function": name, "sql": sql, "fallback": fallback, "plan": [], "full_scans": [], "error": None}
+        params = [None] * sql.count("?")
+        try:
+            entry["plan"] = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error as e:
+            entry["error"] = str(e)
+        entry["full_scans"] = full_scans(entry["plan"])
+        report.append(entry)
+    return report
+
+
+def failed(entry):
+    """Unplannable (e.g. missing table) or scanning; fallbacks are expected to scan."""
+    return bool(entry["error"] or (entry["full_scans"] and not entry["fallback"]))
+
+
+def print_report(report):
+    for entry in report:
+        if entry["error"]:
+            status = f"❌ {entry['error']}"
+        elif entry["full_scans"] and entry["fallback"]:
+            status = "↪️ fallback, " + "; ".join(entry["full_scans"])
+        elif entry["full_scans"]:
+            status = "❌ " + "; ".join(entry["full_scans"])
+        else:
+            status = "✅ indexed"
+        print(f"{entry['function']:<40} {status}")
+    bad = sum(1 for e in report if failed(e))
+    print(f"\n{len(report) - bad}/{len(report)} queries planned without full table scans (fallbacks excepted)")
+    return bad
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else DB_FILE)
+    applied = migrate(conn)
+    print(f"✅ Schema at version {schema_version(conn)}" + ("" if applied else " (nothing to apply)"))
+    try:
+        bad = print_report(explain_report(conn))
+    finally:
+        conn.close()
+    sys.exit(1 if bad else 0)
@@ -1,14 +1,22 @@
 import sqlite3
+import time
+import argparse
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import fastf1
-from get_deg import calculate_tire_degradation  # import your function
+from get_deg import calculate_tire_degradation, DEG_METHODS  # import your function
+from session_retrival import install_ingest_hooks
+from migrations import migrate
+from ingest_progress import completed_rounds
+from deg_writer import driver_lookup, write_round_deg
 
 # ==============================
 # CONFIGURATION
 # ==============================
 DB_FILE = "app/api_retrival/database/f1_data.db"
 YEAR = 2025
+FIRST_LAPS_YEAR = 2018  # FastF1 has lap timing from here on
 import os
 os.makedirs("fastf1_cache", exist_ok=True)
 fastf1.Cache.enable_cache("fastf1_cache")
@@ -16,87 +24,107 @@ fastf1.Cache.enable_cache("fastf1_cache")
 
 
 # ==============================
-# Ensure column exists
+# Rounds that still need degradation
 # ==============================
-def ensure_deg_column():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("PRAGMA table_info(Driver_Race);")
-    cols = [c[1] for c in cur.fetchall()]
-    if "avg_tire_deg_per_lap" not in cols:
-        cur.execute("ALTER TABLE Driver_Race ADD COLUMN avg_tire_deg_per_lap REAL;")
-        print("✅ Added column avg_tire_deg_per_lap.")
-    else:
-        print("ℹ️ Column already exists.")
-    conn.commit()
-    conn.close()
+def rounds_to_fill(conn, year, force=False):
+    """
+    (round, race_id) of the season's raced rounds without degradation yet. A round counts as done
+    when its drivers have values and stints, or the ledger has its 'deg' stage (also set when the
+    sessions loaded but had no usable stints, so those aren't reloaded every run; a failed load
+    raises in the worker and leaves the round to the next run).
+    """
+    rounds = conn.execute("""
+        SELECT r.round, MIN(r.race_id), COUNT(dr.avg_tire_deg_per_lap), COUNT(s.stint_id)
+        FROM Race r
+        JOIN Driver_Race dr ON dr.race_id = r.race_id
+        LEFT JOIN Stint s ON s.driver_race_id = dr.driver_race_id
+        WHERE r.year = ?
+        GROUP BY r.round
+        ORDER BY r.round
+    """, (year,)).fetchall()
+    if force:
+        return [(rnd, race_id) for rnd, race_id, _, _ in rounds]
+    done = completed_rounds(conn, year, "deg")
+    return [(rnd, race_id) for rnd, race_id, filled, stints in rounds
+            if not (filled and stints) and rnd not in done]
 
 
 # ==============================
-# Get all rounds for a season
+# Worker: one round's degradation (no DB access)
 # ==============================
-def get_rounds(year):
-    schedule = fastf1.get_event_schedule(year)
-    # skip only pre-season or testing
-    schedule = schedule[~schedule["EventName"].str.contains("Testing", case=False, na=False)]
-    return schedule[["RoundNumber", "EventName", "EventDate"]].reset_index(drop=True)
-
+def compute_round_deg(year, rnd, method="window"):
+    start = time.monotonic()
+    deg_df, source, stints = calculate_tire_degradation(year, rnd, method, with_stints=True)
+    return deg_df.to_dict("records"), stints.to_dict("records"), source, time.monotonic() - start
 
 
 # ==============================
-# Update degradation values
+# Backfill degradation values
 # ==============================
-def update_tire_deg_for_year(year):
-    ensure_deg_column()
+def backfill_tire_deg(years, workers=4, method="window", force=False):
+    """
+    Fill Driver_Race.avg_tire_deg_per_lap for many seasons.
+    - worker processes compute one round each (Sprint > FP2 > FP3, see get_deg)
+    - this process is the only writer: one executemany per table per finished round, the
+      session's stints (Stint table) written in the same transaction as the degradation
+    - rounds already filled (or marked 'deg' in Ingest_Progress) are skipped unless force=True
+    """
     conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
+    migrate(conn, verbose=False)
+    lookup = driver_lookup(conn)
 
-    rounds = get_rounds(year)
-    print(f"\n=== Updating tyre degradation for {year} season ===")
-
-    for _, event in rounds.iterrows():
-        rnd = int(event["RoundNumber"])
-        name = event["EventName"]
-
-        print(f"\n🏁 Round {rnd}: {name}")
-        try:
-            deg_df, source = calculate_tire_degradation(year, rnd)
-        except Exception as e:
-            print(f"❌ Error calculating degradation for round {rnd}: {e}")
+    todo = []
+    for year in years:
+        if year < FIRST_LAPS_YEAR:
             continue
-
-        if deg_df.empty:
-            print("⚠️ No usable degradation data.")
-            continue
-
-        for _, row in deg_df.iterrows():
-            first = str(row["FirstName"]).strip() if row["FirstName"] else None
-            last = str(row["LastName"]).strip() if row["LastName"] else None
-            deg = row["AvgDegPerLap"]
-
-            if not first or not last or pd.isna(deg):
+        rounds = rounds_to_fill(conn, year, force)
+        print(f"📋 {year}: {len(rounds)} round(s) to fill")
+        todo += [(year, rnd, race_id) for rnd, race_id in rounds]
+    if not todo:
+        print("✔ Nothing to fill.")
+        conn.close()
+        return
+
+    start = time.monotonic()
+    filled = 0
+    install_ingest_hooks()
+    with ProcessPoolExecutor(max_workers=workers, initializer=install_ingest_hooks) as pool:
+        futures = {pool.submit(compute_round_deg, year, rnd, method): (year, rnd, race_id)
+                   for year, rnd, race_id in todo}
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            year, rnd, race_id = futures[future]
+            try:
+                records, stints, source, seconds = future.result()
+            except Exception as e:
+                print(f"❌ [{done_count}/{len(todo)}] {year} R{rnd}: {e} (left for the next run)")
                 continue
+            write_start = time.monotonic()
+            updated = write_round_deg(conn, year, rnd, race_id, records, lookup, stints, source)
+            filled += bool(updated)
+            print(
+                f"{'✅' if updated else '⚠️'} [{done_count}/{len(todo)}] {year} R{rnd}: {updated} drivers, {len(stints)} stints "
+                f"(source: {source}, compute {seconds:.1f}s, write {(time.monotonic() - write_start) * 1000:.0f}ms)"
+            )
 
-            cur.execute("""
-                UPDATE Driver_Race
-                SET avg_tire_deg_per_lap = ?
-                WHERE race_id = (
-                    SELECT race_id FROM Race WHERE year = ? AND round = ?
-                )
-                AND driver_id = (
-                    SELECT driver_id FROM Driver WHERE lower(first_name) = lower(?) AND lower(last_name) = lower(?)
-                );
-            """, (deg, year, rnd, first, last))
+    conn.close()
+    print(f"\n🎯 Degradation filled for {filled}/{len(todo)} rounds in {time.monotonic() - start:.1f}s.")
 
-        conn.commit()
-        print(f"✅ Updated degradation for {len(deg_df)} drivers (source: {source})")
 
-    conn.close()
-    print("\n🎯 All 2024 races updated.")
+def update_tire_deg_for_year(year, workers=4, method="window"):
+    backfill_tire_deg([year], workers=workers, method=method)
 
 
 # ==============================
 # Run script
 # ==============================
 if __name__ == "__main__":
-    update_tire_deg_for_year(2025)
+    current_year = datetime.now().year
+    parser = argparse.ArgumentParser(description="Fill Driver_Race.avg_tire_deg_per_lap from FastF1 laps.")
+    parser.add_argument("--start", type=int, default=current_year, help="first season to fill")
+    parser.add_argument("--end", type=int, default=current_year, help="last season to fill")
+    parser.add_argument("--workers", type=int, default=4, help="rounds computed in parallel")
+    parser.add_argument("--method", choices=DEG_METHODS, default="window", help="degradation model (see get_deg)")
+    parser.add_argument("--force", action="store_true", help="recompute rounds that already have values")
+    args = parser.parse_args()
+
+    backfill_tire_deg(range(args.start, args.end + 1), workers=args.workers, method=args.method, force=args.force)
@@ -1,6 +1,7 @@
 import os
 import sqlite3
 from datetime import datetime
+from migrations import migrate
 
 # ==========================
 # Setup
@@ -107,8 +108,7 @@ def create_all_tables():
     );
 
     """)
-
-    conn.commit()
+    migrate(conn)
     conn.close()
     print(f"✅ Database schema created at {DB_FILE}")
 
@@ -0,0 +1,238 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fastf1.req
+
+# ==========================
+# Setup
+# ==========================
+# one budget for every ingest script: the bucket lives in a small sqlite file, so
+# database_init workers, update.py and new.py running at once all draw from it
+RATE_LIMIT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "rate_limit.db")
+# jolpica (Ergast) allows ~500 requests/hour sustained, fastf1 raises past 500 calls/h itself
+REQUESTS_PER_MINUTE = float(os.environ.get("F1_REQUESTS_PER_MINUTE", 500 / 60))
+BURST = int(os.environ.get("F1_REQUESTS_BURST", 10))
+
+
+# ==========================
+# Token bucket with AIMD backoff on 429
+# ==========================
+class TokenBucket:
+    """
+    requests-per-minute budget refilled continuously up to `burst` tokens.
+    - state_file=None keeps the bucket in this process; a path shares it across processes
+    - a 429 halves the current rate (not below min_rate) and pauses every client for the
+      Retry-After / backoff delay; each success adds recover_step back up to per_minute
+    """
+
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE, burst=BURST, state_file=None,
+                 min_rate=0.5, recover_step=0.05):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.state_file = state_file
+        self.min_rate = min_rate
+        self.recover_step = recover_step
+        self._lock = threading.Lock()
+        self._state = {"tokens": float(burst), "updated": time.time(), "rate": per_minute, "blocked_until": 0.0}
+        if state_file:
+            os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+            conn = sqlite3.connect(state_file, timeout=30)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Bucket (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL, updated REAL, rate REAL, blocked_until REAL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO Bucket VALUES ('global', ?, ?, ?, 0)",
+                         (float(burst), time.time(), per_minute))
+            conn.commit()
+            conn.close()
+
+    def _transact(self, change):
+        """Apply change(state, now) atomically and return what it returns."""
+        with self._lock:
+            if not self.state_file:
+                return change(self._state, time.time())
+            conn = sqlite3.connect(self.state_file, timeout=30, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                tokens, updated, rate, blocked_until = conn.execute(
+                    "SELECT tokens, updated, rate, blocked_until FROM Bucket WHERE name = 'global'"
+                ).fetchone()
+                state = {"tokens": tokens, "updated": updated, "rate": rate, "blocked_until": blocked_until}
+                result = change(state, time.time())
+                conn.execute(
+                    "UPDATE Bucket SET tokens = ?, updated = ?, rate = ?, blocked_until = ? WHERE name = 'global'",
+                    (state["tokens"], state["updated"], state["rate"], state["blocked_until"]),
+                )
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def _take(self, state, now):
+        """Refill, then take a token; returns the seconds to wait when there isn't one."""
+        if now < state["blocked_until"]:
+            return state["blocked_until"] - now
+        state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * state["rate"] / 60)
+        state["updated"] = now
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return 0.0
+        return (1 - state["tokens"]) * 60 / state["rate"]
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            wait_for = self._transact(self._take)
+            if wait_for <= 0:
+                return waited
+            time.sleep(wait_for)
+            waited += wait_for
+
+    def penalise(self, delay):
+        def change(state, now):
+            state["rate"] = max(self.min_rate, state["rate"] / 2)
+            state["blocked_until"] = max(state["blocked_until"], now + delay)
+            state["tokens"] = 0.0
+            return state["rate"]
+        return self._transact(change)
+
+    def reward(self):
+        def change(state, now):
+            state["rate"] = min(self.per_minute, state["rate"] + self.recover_step)
+        self._transact(change)
+
+
+def retry_delay(response, attempt, base=5.0, cap=300.0):
+    """Seconds to back off after a 429: Retry-After when given, else exponential with jitter."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return min(cap, base * 2 ** attempt) * random.uniform(0.8, 1.2)
+
+
+# ==========================
+# Hook into fastf1's HTTP layer
+# ==========================
+_bucket = None
+_original_send = None
+
+def install_rate_limiter(bucket=None, max_retries=5):
+    """
+    Route every real FastF1/Ergast HTTP request through the token bucket.
+    Wraps fastf1.req._SessionWithRateLimiting.send, which requests-cache only reaches on
+    a cache miss, so cached responses and fixture replays don't use up the budget.
+    """
+    global _bucket, _original_send
+    if _original_send is not None:
+        return _bucket
+    _bucket = bucket or TokenBucket(state_file=RATE_LIMIT_FILE)
+    _original_send = fastf1.req._SessionWithRateLimiting.send
+
+    def send(session, request, **kwargs):
+        attempt = 0
+        while True:
+            check_cancelled()
+            _bucket.acquire()
+            response = _original_send(session, request, **kwargs)
+            if response.status_code != 429 or attempt >= max_retries:
+                break
+            delay = retry_delay(response, attempt)
+            rate = _bucket.penalise(delay)
+            print(f"⏸️ 429 from {request.url.split('?')[0]}, backing off {delay:.0f}s (budget now {rate:.1f}/min)")
+            attempt += 1
+        if response.status_code < 400:
+            _bucket.reward()
+        return response
+
+    fastf1.req._SessionWithRateLimiting.send = send
+    return _bucket
+
+
+def uninstall_rate_limiter():
+    global _bucket, _original_send
+    if _original_send is not None:
+        fastf1.req._SessionWithRateLimiting.send = _original_send
+        _bucket = _original_send = None
+
+
+# ==========================
+# Prefetcher
+# ==========================
+class LoadCancelled(Exception):
+    """Raised inside a prefetch worker whose key was cancelled, at its next HTTP request."""
+
+
+_worker = threading.local()
+
+def check_cancelled():
+    """Abort the current prefetch load if its key was cancelled (no-op outside prefetch workers)."""
+    cancelled = getattr(_worker, "cancelled", None)
+    if cancelled is not None and cancelled.is_set():
+        raise LoadCancelled()
+
+
+class Prefetcher:
+    """
+    Loads upcoming keys, e.g. (year, round) or (year, round, session), on a thread pool
+    with loader(*key). The shared token bucket keeps the requests in budget, so workers
+    only overlap network waits. get(key) blocks for that key's result (or re-raises).
+    cancel(keys) drops loads that haven't started and stops running ones at their next
+    real HTTP request (FastF1 parsing of data already fetched can't be interrupted).
+    """
+
+    def __init__(self, loader, workers=4):
+        self.loader = loader
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.futures = {}
+        self.cancelled = {}
+
+    def _run(self, key):
+        _worker.cancelled = self.cancelled[key]
+        try:
+            return self.loader(*key)
+        finally:
+            _worker.cancelled = None
+
+    def prefetch(self, keys):
+        for key in keys:
+            if key not in self.futures:
+                self.cancelled[key] = threading.Event()
+                self.futures[key] = self.pool.submit(self._run, key)
+        return self
+
+    def get(self, key):
+        if key not in self.futures:
+            self.prefetch([key])
+        return self.futures[key].result()
+
+    def cancel(self, keys):
+        for key in keys:
+            if key in self.futures:
+                self.cancelled[key].set()
+                self.futures[key].cancel()
+
+    def cancel_pending(self):
+        self.cancel(list(self.futures))
+
+    def close(self, wait=True):
+        """wait=False returns at once; cancelled loads still running wind down in the background."""
+        self.cancel_pending()
+        self.pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import session_retrival as fn
 
 def add_elo_rating(year, round, previous_elo, elo_type, k_modifiers, round_results):
@@ -26,6 +27,75 @@ def add_elo_rating(year, round, previous_elo, elo_type, k_modifiers, round_resul
     return new_elo_frame
 
 def calculate_elo(round_results, elo_type, new_elo_frame, round, k_modifiers):
+    constructor_elo = None
+    if k_modifiers is not None:
+        #resolve each entrant's constructor elo once per round instead of once per pair
+        modifiers = k_modifiers.drop_duplicates(subset=["ConstructorName"], keep="first").set_index("ConstructorName")[round]
+        constructor_elo = modifiers.loc[round_results["ConstructorName"]].to_numpy(dtype=float)
+
+    keys = round_results[elo_type].to_numpy()
+    slots, slot_keys = pd.factorize(keys, use_na_sentinel=False)
+    current = new_elo_frame.drop_duplicates(subset=[elo_type], keep="first").set_index(elo_type)
+
+    elo = current.loc[keys, round - 1].to_numpy(dtype=float)
+    grid = pd.to_numeric(round_results["GridPosition"], errors="coerce").to_numpy(dtype=float)
+    positions = pd.to_numeric(round_results["RacePosition"], errors="coerce").to_numpy(dtype=float)
+
+    deltas = elo_round_deltas(elo, grid, positions, constructor_elo)
+    updated = accumulate_deltas(current.loc[slot_keys, round].to_numpy(dtype=float), slots, deltas)
+
+    rows = new_elo_frame[elo_type].isin(slot_keys)
+    new_elo_frame[round] = new_elo_frame[round].astype(float)
+    new_elo_frame.loc[rows, round] = new_elo_frame.loc[rows, elo_type].map(pd.Series(updated, index=slot_keys)).to_numpy()
+    return new_elo_frame
+
+#vectorised version of the pair loop below: row A / column B of each matrix is player_A vs player_B
+#leading axes broadcast, so elo_calibration can run many parameter sets through the same functions
+def elo_round_deltas(elo, grid, positions, constructor_elo=None):
+    expected = expected_score_matrix(elo)
+    actual = actual_result_matrix(positions)
+    k = grid_k_matrix(grid)
+    if constructor_elo is not None:
+        k = combined_k_matrix(actual, constructor_elo)*k
+    return k*(actual - expected)
+
+def expected_score_matrix(elo, scale=400, exact=True):
+    #float_power goes through libm pow like determine_win_chance does, np.power is faster but can differ in the last bit
+    power = np.float_power if exact else np.power
+    exp2 = 1 + power(10.0, (elo[..., None, :] - elo[..., :, None])/scale)
+    return 1/exp2
+
+def actual_result_matrix(positions):
+    rank_A = positions[..., :, None]
+    rank_B = positions[..., None, :]
+    return np.where(rank_A < rank_B, 1.0, np.where(rank_B < rank_A, 0.0, 0.5))
+
+def grid_k_matrix(grid, k=30, grid_weight=1):
+    pair_k = k + grid_weight*grid[..., :, None] - grid_weight*grid[..., None, :]
+    return np.where(np.isnan(pair_k), k, pair_k)
+
+def combined_k_matrix(actual, constructor_elo):
+    #same steps as calculate_k_combined, for every pair at once
+    constructor_A = constructor_elo[..., :, None]
+    constructor_B = constructor_elo[..., None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = (constructor_B - constructor_A)/(constructor_B) + 1
+    lost = actual == 0
+    k = np.where(lost & (k > 1), k - 1, np.where(lost & (k < 1), k + 1, k))
+    return np.where(constructor_B == 0, 0.0, k)
+
+def accumulate_deltas(start, slots, deltas):
+    #every slot gets its pair deltas added one at a time in the same order the loop adds them,
+    #summing the stack down axis 0 keeps that order so the result matches the loop bit for bit
+    n = len(slots)
+    occurrence = pd.Series(slots).groupby(slots).cumcount().to_numpy()
+    stack = np.zeros((1 + (occurrence.max() + 1)*n, len(start)))
+    stack[0] = start
+    stack[1 + occurrence[:, None]*n + np.arange(n), slots[:, None]] = deltas
+    return stack.sum(axis=0)
+
+#reference pair loop, kept for parity checks against the vectorised version
+def calculate_elo_loop(round_results, elo_type, new_elo_frame, round, k_modifiers):
     for _, player_A in round_results[["DriverId", "RacePosition", "GridPosition", "ConstructorName"]].iterrows():
         for _, player_B in round_results[["DriverId", "RacePosition", "GridPosition", "ConstructorName"]].iterrows():
 
@@ -112,34 +182,122 @@ def check_new_drivers(session, existing_elo, elo_type):
         return all_new_rows, bol
                 
                 
-def get_season_elos(year):
+class RatingStore:
+    """
+    Season ratings for one elo type.
+    - ratings = current elo, one slot per interned DriverId / ConstructorName
+    - history = preallocated (slots x rounds+1) array, column 0 is the starting elo
+    - to_frame() gives the wide per-round table combine_elo_session merges against
+    """
 
-    elo_types = ["DriverId", "ConstructorName", "Combined"]
-    j = pd.DataFrame()
-    m = pd.DataFrame()
-    player_elo = pd.DataFrame()
+    def __init__(self, elo_type, rounds, label_columns=(), start_elo=1000):
+        self.elo_type = elo_type
+        self.rounds = rounds
+        self.label_columns = list(label_columns)
+        self.start_elo = start_elo
+        self.slots = {}
+        self.labels = []
+        self.size = 0
+        self._ratings = np.full(32, float(start_elo))
+        self._history = np.full((32, rounds + 1), float(start_elo))
 
-    round_count = fn.get_rounds_count(year)
+    @property
+    def ratings(self):
+        return self._ratings[:self.size]
 
-    
-    for i in range(1,round_count+1):
-        print("XXX", i)
-        res = fn.get_session(year, i)
-        j = add_elo_rating(year, i, j, elo_types[1], None, res)
-       
-     
-        m = add_elo_rating(year, i, m, elo_types[0], j[["ConstructorName", i]], res) 
-       
-        player_elo = add_elo_rating(year, i, player_elo, elo_types[0], None, res) 
-    
+    @property
+    def history(self):
+        return self._history[:self.size]
+
+    def intern(self, round_results):
+        """Return the slot of every entrant, giving new drivers/constructors a fresh slot at start_elo."""
+        keys = round_results[self.elo_type].tolist()
+        labels = round_results[self.label_columns].to_numpy().tolist()
+        for key, label in zip(keys, labels):
+            if key not in self.slots:
+                self.slots[key] = self.size
+                self.labels.append((key, *label))
+                self.size += 1
+        if self.size > len(self._ratings):
+            self._grow(self.size)
+        return np.array([self.slots[key] for key in keys], dtype=int)
+
+    def _grow(self, needed):
+        capacity = max(needed, 2*len(self._ratings))
+        ratings = np.full(capacity, float(self.start_elo))
+        ratings[:len(self._ratings)] = self._ratings
+        history = np.full((capacity, self.rounds + 1), float(self.start_elo))
+        history[:len(self._history)] = self._history
+        self._ratings, self._history = ratings, history
+
+    def restore(self, labels, ratings):
+        """Seed the store with entrants carried over from an earlier season; their history starts at that rating."""
+        for label, rating in zip(labels, ratings):
+            key = label[0]
+            if key not in self.slots:
+                self.slots[key] = self.size
+                self.labels.append(tuple(label))
+                self.size += 1
+                if self.size > len(self._ratings):
+                    self._grow(self.size)
+            slot = self.slots[key]
+            self._ratings[slot] = rating
+            self._history[slot] = rating
+
+    def next_season(self, rounds):
+        store = RatingStore(self.elo_type, rounds, self.label_columns, self.start_elo)
+        store.restore(self.labels, self.ratings)
+        return store
+
+    def lookup(self, keys):
+        return self.ratings[[self.slots[key] for key in keys]]
+
+    def update(self, round, round_results, constructor_elo=None):
+        """Apply one round of results; rounds an entrant misses carry their rating forward."""
+        entrants = self.intern(round_results)
+        slots, targets = pd.factorize(entrants)
+        grid = pd.to_numeric(round_results["GridPosition"], errors="coerce").to_numpy(dtype=float)
+        positions = pd.to_numeric(round_results["RacePosition"], errors="coerce").to_numpy(dtype=float)
+
+        deltas = elo_round_deltas(self._ratings[entrants], grid, positions, constructor_elo)
+        self._ratings[targets] = accumulate_deltas(self._ratings[targets], slots, deltas)
+        self._history[:self.size, round] = self.ratings
+
+    def carry_forward(self, round):
+        """Record a round with no results (e.g. a cancelled race) without changing any rating."""
+        self._history[:self.size, round] = self.ratings
+
+    def to_frame(self):
+        labels = pd.DataFrame(self.labels, columns=[self.elo_type] + self.label_columns)
+        history = pd.DataFrame(self.history, columns=range(self.rounds + 1))
+        return pd.concat([labels, history], axis=1)
+
+
+def compute_season_elos(results_by_round):
+    """Driver, constructor and combined elo for a season of {round: get_session frame}; missing rounds carry ratings forward."""
+    round_count = max(results_by_round)
+    player_elo = RatingStore("DriverId", round_count, ["FirstName", "LastName"])
+    j = RatingStore("ConstructorName", round_count)
+    m = RatingStore("DriverId", round_count, ["FirstName", "LastName"])
+
+    for i in range(1, round_count + 1):
+        res = results_by_round.get(i)
+        if res is None:
+            for store in (j, m, player_elo):
+                store.carry_forward(i)
+            continue
+        j.update(i, res)
+        m.update(i, res, j.lookup(res["ConstructorName"]))
+        player_elo.update(i, res)
 
+    return (player_elo.to_frame(), j.to_frame(), m.to_frame())
 
-    j.drop(columns=['FirstName', 'LastName', 'DriverId', 'GridPosition'], inplace=True)
-    j = j.drop_duplicates(subset=["ConstructorName"], keep="first")
 
-    m.drop(columns=['ConstructorName', 'GridPosition'], inplace=True)
-    player_elo.drop(columns=['GridPosition', 'ConstructorName'], inplace=True)
-    return  (player_elo, j, m)
+def get_season_elos(year, sessions=None):
+    #pass the frames from session_retrival.get_season_sessions to avoid fetching the season again
+    if sessions is None:
+        sessions = fn.get_season_sessions(year)
+    return compute_season_elos(sessions)
 
 
 if __name__ == "__main__":
@@ -1,26 +1,83 @@
 #pip install fastf1
 import os
+import sys
+import json
+import tempfile
+import threading
 import fastf1
 from fastf1.ergast import Ergast
 from datetime import datetime
 import pandas as pd
+from fixtures import install_from_env
+from prefetch import install_rate_limiter, Prefetcher
+
+PREFETCH_WORKERS = 4
+
+CACHE_DIR = 'fastf1_cache'
+#one pickle per season of {round: get_session frame}, so a round is only fetched and renamed once
+RESULTS_STORE_DIR = 'app/api_retrival/database/results_store'
+
+_cache_enabled = False
+
+#called by the ingest entry points (database_init, update, new, benchmark) and their worker processes,
+#not at import, so importing this module doesn't patch fastf1's HTTP session or create rate_limit.db
+def install_ingest_hooks():
+    #F1_FIXTURES=<dir> serves FastF1/Ergast from recorded responses (see fixtures.py)
+    install_from_env()
+    #every real request draws from the requests-per-minute budget shared by all ingest scripts
+    install_rate_limiter()
+#prefetch threads update the same season file (other processes are covered by replace_file)
+_store_lock = threading.Lock()
+
+def enable_cache():
+    global _cache_enabled
+    if not _cache_enabled:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fastf1.Cache.enable_cache(CACHE_DIR)
+        _cache_enabled = True
+
+#what Session.load() pulls for each consumer; session.results is always loaded
+#results -> elo and db ingest, laps -> get_deg, weather on demand, full = fastf1's defaults
+LOAD_PROFILES = {
+    "results": {"laps": False, "telemetry": False, "weather": False, "messages": False},
+    "laps": {"laps": True, "telemetry": False, "weather": False, "messages": False},
+    "weather": {"laps": False, "telemetry": False, "weather": True, "messages": False},
+    "messages": {"laps": False, "telemetry": False, "weather": False, "messages": True},
+    "telemetry": {"laps": True, "telemetry": True, "weather": False, "messages": False},
+    "full": {"laps": True, "telemetry": True, "weather": True, "messages": True},
+}
+
+#profile can be one name or several, e.g. ("laps", "weather")
+def load_options(profile="results"):
+    names = [profile] if isinstance(profile, str) else list(profile)
+    options = dict.fromkeys(LOAD_PROFILES["full"], False)
+    for name in names:
+        if name not in LOAD_PROFILES:
+            raise ValueError(f"Unknown load profile {name!r}, expected one of {sorted(LOAD_PROFILES)}")
+        for key, wanted in LOAD_PROFILES[name].items():
+            options[key] = options[key] or wanted
+    return options
+
+def load_with_profile(session, profile="results"):
+    session.load(**load_options(profile))
+    return session
 
 #gets an individual session number, just like practice race 3 from 2019 round 3
 #returns similar to a datafram object
 #https://docs.fastf1.dev/core.html#fastf1.core.SessionResults
 #best for post 2018 results, but works post 2011. doesnt work before 2003
-def get_session_indivdual_post(year, round, session_num):
+def get_session_indivdual_post(year, round, session_num, profile="results"):
     a = fastf1.get_event(year, round)
     
     b = a.get_session(session_num)
-    b.load()
+    load_with_profile(b, profile)
     c = b.results
     c["CircutLocation"] = a["Location"]
     return c
 
 #gets an individual session as well but through ergest, better used for pre 2018
-def get_session_indivdual_pre(year, round, session_num):
-    ergast = Ergast()
+def get_session_indivdual_pre(year, round, session_num, ergast=None):
+    ergast = ergast or Ergast()
     if session_num < 4:
         a = ergast.get_qualifying_results(season=year, round=round)
 
@@ -29,72 +86,209 @@ def get_session_indivdual_pre(year, round, session_num):
 
     return a.content[0]
 
+# ==========================
+# Results store
+# ==========================
+def store_path(year):
+    return os.path.join(RESULTS_STORE_DIR, f"{year}.pkl")
+
+def read_season_store(year):
+    path = store_path(year)
+    if not os.path.exists(path):
+        return {}
+    return pd.read_pickle(path)
+
+#write to a temp file of our own next to path, then swap it in: a backfill worker and update.py writing
+#the same season never share a temp file, and readers only ever see a complete file (the last replace
+#wins, so a round another process added in between is just fetched again later)
+def replace_file(path, write):
+    os.makedirs(RESULTS_STORE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def write_season_store(year, sessions):
+    replace_file(store_path(year), lambda f: pd.to_pickle(sessions, f))
+
+#round numbers of the last bulk pull (pre 2018), so a store missing rounds is spotted without asking Ergast
+def rounds_path(year):
+    return os.path.join(RESULTS_STORE_DIR, f"{year}.rounds.json")
+
+def read_season_rounds(year):
+    path = rounds_path(year)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_season_rounds(year, rounds):
+    replace_file(rounds_path(year), lambda f: f.write(json.dumps(sorted(int(r) for r in rounds)).encode()))
+
+#merge a bulk pull into the store and remember which rounds it had; returns the merged store
+def store_bulk_season(year, sessions):
+    with _store_lock:
+        stored = read_season_store(year)
+        stored.update(sessions)
+        write_season_store(year, stored)
+        write_season_rounds(year, sessions)
+    return stored
+
+#drop stored rounds so the next get_session fetches them again (e.g. the live season after a penalty)
+#round=None drops the whole season
+def invalidate_stored_sessions(year, round=None):
+    if round is None:
+        for path in (store_path(year), rounds_path(year)):
+            if os.path.exists(path):
+                os.remove(path)
+        return
+    sessions = read_season_store(year)
+    if sessions.pop(round, None) is not None:
+        write_season_store(year, sessions)
+
+
+#returns the stored frame when there is one, otherwise fetches it and stores it
+#refresh=True always fetches and overwrites the stored copy; empty results are never stored
+def get_session(year, round, refresh=False):
+    if not refresh:
+        stored = read_season_store(year).get(round)
+        if stored is not None:
+            return stored.copy()
+
+    if 1950 <= year < 2018:
+        #one bulk pull stores the whole season, so the season's other rounds are local reads from then on
+        sessions = fetch_ergast_season(year)
+        if sessions:
+            store_bulk_season(year, sessions)
+        final = sessions.get(round)
+        return pd.DataFrame() if final is None else final.copy()
+
+    final = fetch_session(year, round)
+    if final is not None and not final.empty:
+        with _store_lock:
+            sessions = read_season_store(year)
+            sessions[round] = final
+            write_season_store(year, sessions)
+    return final
+
+
+# ==========================
+# Ergast (pre 2018)
+# ==========================
+ERGAST_RESULT_COLUMNS = {
+    'number': 'DriverNumber',
+    'driverUrl': 'DriverUrl',
+    'driverId': 'DriverId',
+    'position': 'RacePosition',
+    'constructorName': 'ConstructorName',
+    'driverNationality': 'CountryName',
+    'givenName': 'FirstName',
+    'familyName': 'LastName',
+    'points': 'Points',
+    'grid': 'GridPosition',
+    'laps': 'Laps',
+    'totalRaceTime': 'RaceTime',
+    'status': 'Status',
+}
+
+#race results (+ qualifying from 2003) of one round in get_session's column names
+def normalize_ergast_round(year, race, qualifying, locality):
+    a = race.rename(columns=ERGAST_RESULT_COLUMNS)
+    a = a[[
+            'DriverId',
+            'RacePosition',
+            'ConstructorName',
+            'FirstName',
+            'LastName',
+            'Points',
+            'GridPosition',
+            'Laps',
+            'RaceTime',
+            'Status',
+            'DriverNumber',
+            'DriverUrl'
+        ]]
+    if year > 2002 and qualifying is not None:
+        b = qualifying.copy()
+        if "Q3" not in b.columns:
+            b["Q2"] = 0
+            b["Q3"] = 0
+        
+        b = b[['Q1', 'Q2', 'Q3', 'position', 'driverId']]
+        b = b.rename(columns={
+            'position':'QualifyingPosition',
+            'driverId':'DriverId',
+        })
+        final = a.merge(b, on='DriverId', how='left')
+        
+    else:
+        final = a.copy()
+        final["Q1"] = 0
+        final["Q2"] = 0
+        final["Q3"] = 0
+        final['QualifyingPosition'] = 0
+    
+    final["CircuitLocation"] = locality
+    return final
+
+#pages through a season wide Ergast endpoint, returns {round: frame} and {round: race description row}
+#a race cut off by a page boundary is glued back together
+def get_ergast_season_pages(response):
+    frames, races = {}, {}
+    while True:
+        for (_, race), frame in zip(response.description.iterrows(), response.content):
+            rnd = int(race["round"])
+            frames.setdefault(rnd, []).append(frame)
+            races[rnd] = race
+        if response.is_complete:
+            break
+        try:
+            response = response.get_next_result_page()
+        except ValueError:
+            break
+    return {rnd: pd.concat(parts, ignore_index=True) for rnd, parts in frames.items()}, races
+
+#every round of a pre 2018 season from Ergast's season wide results/qualifying endpoints,
+#a few paged requests instead of two or three per round
+def fetch_ergast_season(year, limit=100):
+    enable_cache()
+    if year >= 2018 or year < 1950:
+        return {}
+    ergast = Ergast(limit=limit)
+    races, descriptions = get_ergast_season_pages(ergast.get_race_results(season=year))
+    qualifying = get_ergast_season_pages(ergast.get_qualifying_results(season=year))[0] if year > 2002 else {}
+
+    sessions = {}
+    for rnd in sorted(races):
+        final = normalize_ergast_round(year, races[rnd], qualifying.get(rnd), descriptions[rnd]["locality"])
+        final["Round"] = rnd
+        final["Year"] = year
+        sessions[rnd] = final
+    return sessions
+
+
 #get any session, will return empty dataframe if it doesnt exist in the database or is invalid
-def get_session(year, round):
-    CACHE_DIR = 'fastf1_cache'
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    fastf1.Cache.enable_cache(CACHE_DIR)
+def fetch_session(year, round):
+    enable_cache()
     if year > datetime.now().year or year < 1950:
         return pd.DataFrame()
     
     if year < 2018:
-        circuits = Ergast().get_circuits(year)
+        ergast = Ergast()
+        circuits = ergast.get_circuits(year)
 
 
         if round > len(circuits) or round < 1: 
             return pd.DataFrame() 
-        a = get_session_indivdual_pre(year=year, round=round, session_num=5)
-        a.rename(columns={
-            'number': 'DriverNumber',
-            'driverUrl': 'DriverUrl',
-            'driverId': 'DriverId',
-            'position': 'RacePosition',
-            'constructorName': 'ConstructorName',
-            'driverNationality': 'CountryName',
-            'givenName': 'FirstName',
-            'familyName': 'LastName',
-            'points': 'Points',
-            'grid': 'GridPosition',
-            'laps': 'Laps',
-            'totalRaceTime': 'RaceTime',
-            'status': 'Status',
-        }, inplace=True)
-        a = a[[
-                'DriverId',
-                'RacePosition',
-                'ConstructorName',
-                'FirstName',
-                'LastName',
-                'Points',
-                'GridPosition',
-                'Laps',
-                'RaceTime',
-                'Status',
-                'DriverNumber',
-                'DriverUrl'
-            ]]
-        if year > 2002:
-            b = get_session_indivdual_pre(year=year, round=round, session_num=0)
-            if "Q3" not in b.columns:
-                b["Q2"] = 0
-                b["Q3"] = 0
-            
-            b = b[['Q1', 'Q2', 'Q3', 'position', 'driverId']]
-            b.rename(columns={
-                'position':'QualifyingPosition',
-                'driverId':'DriverId',
-            }, inplace=True)
-            final = a.merge(b, on='DriverId', how='left')
-            
-        else:
-            b = pd.DataFrame()
-            a["Q1"] = 0
-            a["Q2"] = 0
-            a["Q3"] = 0
-            a['QualifyingPosition'] = 0
-            final = a
-        
-        final["CircuitLocation"] = Ergast().get_circuits(year, round).loc[0, 'locality']
+        a = get_session_indivdual_pre(year=year, round=round, session_num=5, ergast=ergast)
+        b = get_session_indivdual_pre(year=year, round=round, session_num=0, ergast=ergast) if year > 2002 else None
+        locality = ergast.get_circuits(year, round).loc[0, 'locality']
+        final = normalize_ergast_round(year, a, b, locality)
         
         
     else:
@@ -121,6 +315,38 @@ def get_session(year, round):
 
 
 
+#loads every round of a season exactly once, so elo and the db ingest can share the same frames
+#rounds that fail to load or have no results (e.g. not run yet) are left out
+#2018+ rounds load on a thread pool; the shared rate limiter keeps them within budget
+def get_season_sessions(year):
+    if year < 2018:
+        #completed seasons: the store, topped up by a single bulk pull when it is missing rounds
+        #the last bulk pull had (dropped by invalidate_stored_sessions) or has no round list yet
+        sessions = read_season_store(year)
+        expected = read_season_rounds(year)
+        if not sessions or expected is None or set(expected) - set(sessions):
+            fetched = fetch_ergast_season(year)
+            if fetched:
+                sessions = store_bulk_season(year, fetched)
+        return {rnd: sessions[rnd].copy() for rnd in sorted(sessions)}
+
+    sessions = {}
+    rounds = [(year, i) for i in range(1, get_rounds_count(year) + 1)]
+    with Prefetcher(get_session, workers=PREFETCH_WORKERS) as prefetcher:
+        prefetcher.prefetch(rounds)
+        for _, i in rounds:
+            try:
+                session = prefetcher.get((year, i))
+            except ValueError as e:
+                print(f"⚠️ Skipping round {i}: {e}")
+                continue
+            if session is None or session.empty:
+                print(f"⚠️ No session data for round {i}")
+                continue
+            sessions[i] = session
+    return sessions
+
+
 def get_rounds_count(year):
     if year < 2018:
         circuits = Ergast().get_circuits(year)
@@ -133,8 +359,14 @@ def get_rounds_count(year):
 
 
 if __name__ == "__main__":
-    
-    print(get_session(2025,19))
+    #python session_retrival.py invalidate <year> [round]
+    if len(sys.argv) >= 3 and sys.argv[1] == "invalidate":
+        year = int(sys.argv[2])
+        rnd = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        invalidate_stored_sessions(year, rnd)
+        print(f"🗑️ Dropped stored results for {year}" + (f" round {rnd}" if rnd else ""))
+    else:
+        print(get_session(2025,19))
 
 
     
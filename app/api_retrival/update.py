@@ -1,13 +1,19 @@
 import os
+import sys
 import sqlite3
 import fastf1
 import pandas as pd
 from datetime import datetime, timezone
 
 from races import getRaces
-from round_elo import add_elo_rating
+from round_elo import add_elo_rating, RatingStore
 from get_deg import calculate_tire_degradation
-from session_retrival import get_session  # loads one FastF1 session (single round)
+from session_retrival import get_session, install_ingest_hooks  # loads one FastF1 session (single round)
+from latest_rating import update_latest_rating
+from migrations import migrate
+from ingest_progress import mark_done
+from elo_replay import drop_checkpoints
+from deg_writer import driver_lookup, write_round_deg
 
 # ==========================
 # Setup
@@ -40,13 +46,6 @@ def safe_date(val):
     return pd.to_datetime(val).strftime("%Y-%m-%d")
 
 
-def ensure_deg_column(cur):
-    cur.execute("PRAGMA table_info(Driver_Race);")
-    cols = [c[1] for c in cur.fetchall()]
-    if "avg_tire_deg_per_lap" not in cols:
-        cur.execute("ALTER TABLE Driver_Race ADD COLUMN avg_tire_deg_per_lap REAL;")
-
-
 # ============================================================
 # Retrieve existing Elo tables (pivoted by CODE/NAME, not names)
 # ============================================================
@@ -137,6 +136,7 @@ def update_latest_round(year: int):
     print(f"🔎 Latest race: Round {rnd} – {name} ({circuit}, {date_val})")
 
     conn = sqlite3.connect(DB_FILE)
+    migrate(conn)
     cur = conn.cursor()
 
     # Ensure race row exists
@@ -309,14 +309,18 @@ def update_latest_round(year: int):
     conn.commit()
     print("✅ Elo ratings updated.")
 
+    update_latest_rating(conn, [race_id])
+    mark_done(conn, year, rnd, "write", len(round_df))
+    conn.commit()
+    drop_checkpoints(year)
+
     # =======================================================
     # TYRE DEGRADATION (match by driver code)
     # =======================================================
     print(f"🛞 Calculating tyre degradation for Round {rnd}...")
     try:
-        ensure_deg_column(cur)
         try:
-            deg_df, source = calculate_tire_degradation(year, rnd)
+            deg_df, source, stints = calculate_tire_degradation(year, rnd, with_stints=True)
         except Exception as e:
             print(f"❌ Error calculating degradation for round {rnd}: {e}")
             conn.close()
@@ -327,31 +331,11 @@ def update_latest_round(year: int):
             conn.close()
             return
 
-        updated = 0
-        for _, row in deg_df.iterrows():
-            first = str(row.get("FirstName") or "").strip()
-            last = str(row.get("LastName") or "").strip()
-            deg = row.get("AvgDegPerLap")
-
-            if not first or not last or pd.isna(deg):
-                continue
-
-            cur.execute(
-                """
-                UPDATE Driver_Race
-                SET avg_tire_deg_per_lap = ?
-                WHERE race_id = ?
-                  AND driver_id = (
-                      SELECT driver_id FROM Driver
-                      WHERE lower(first_name)=lower(?) AND lower(last_name)=lower(?)
-                  )
-                """,
-                (float(deg), race_id, first, last),
-            )
-            updated += cur.rowcount
-
-        conn.commit()
-        print(f"✅ Updated degradation for {updated} drivers (source: {source})")
+        updated = write_round_deg(
+            conn, year, rnd, race_id, deg_df.to_dict("records"), driver_lookup(conn),
+            stints.to_dict("records"), source,
+        )
+        print(f"✅ Updated degradation for {updated} drivers, {len(stints)} stints (source: {source})")
 
     except Exception as e:
         print(f"❌ Tyre degradation failed: {e}")
@@ -360,7 +344,197 @@ def update_latest_round(year: int):
     print(f"🎯 Update complete for Round {rnd} – {name}")
 
 
+# ============================================================
+# Recompute Elo from a corrected round onward
+# ============================================================
+def get_ratings_before(conn, year, rnd):
+    """Each driver's / constructor's last stored Elo of the season before round `rnd`."""
+    driver_df = pd.read_sql_query(
+        """
+        SELECT d.code AS DriverId,
+               d.first_name AS FirstName,
+               d.last_name AS LastName,
+               dr.elo AS DriverElo,
+               dr.combined_elo AS CombinedElo
+        FROM Driver_Race dr
+        JOIN Race r ON dr.race_id = r.race_id
+        JOIN Driver d ON dr.driver_id = d.driver_id
+        WHERE r.year = ? AND r.round < ?
+        ORDER BY r.round
+        """,
+        conn,
+        params=(year, rnd),
+    )
+    constructor_df = pd.read_sql_query(
+        """
+        SELECT c.name AS ConstructorName, cr.elo AS ConstructorElo
+        FROM Constructor_Race cr
+        JOIN Race r ON cr.race_id = r.race_id
+        JOIN Constructor c ON cr.constructor_id = c.constructor_id
+        WHERE r.year = ? AND r.round < ?
+        ORDER BY r.round
+        """,
+        conn,
+        params=(year, rnd),
+    )
+
+    def last_rating(df, key, col):
+        df = df.dropna(subset=[col]).drop_duplicates(subset=[key], keep="last")
+        return df, df[col].to_numpy(dtype=float)
+
+    drv, drv_elo = last_rating(driver_df, "DriverId", "DriverElo")
+    cmb, cmb_elo = last_rating(driver_df, "DriverId", "CombinedElo")
+    con, con_elo = last_rating(constructor_df, "ConstructorName", "ConstructorElo")
+    return (
+        (drv[["DriverId", "FirstName", "LastName"]].to_numpy().tolist(), drv_elo),
+        (con[["ConstructorName"]].to_numpy().tolist(), con_elo),
+        (cmb[["DriverId", "FirstName", "LastName"]].to_numpy().tolist(), cmb_elo),
+    )
+
+
+def get_results_from(conn, year, rnd):
+    """Stored classification for rounds >= rnd, in get_session column names."""
+    return pd.read_sql_query(
+        """
+        SELECT r.round AS Round,
+               r.race_id,
+               dr.driver_id,
+               dr.constructor_id,
+               d.code AS DriverId,
+               d.first_name AS FirstName,
+               d.last_name AS LastName,
+               c.name AS ConstructorName,
+               dr.GridPosition,
+               dr.position AS RacePosition
+        FROM Driver_Race dr
+        JOIN Race r ON dr.race_id = r.race_id
+        JOIN Driver d ON dr.driver_id = d.driver_id
+        JOIN Constructor c ON dr.constructor_id = c.constructor_id
+        WHERE r.year = ? AND r.round >= ?
+        ORDER BY r.round, dr.driver_race_id
+        """,
+        conn,
+        params=(year, rnd),
+    )
+
+
+def refresh_round_results(cur, year, rnd):
+    """Overwrite the stored classification of one round with a fresh get_session pull."""
+    cur.execute("SELECT race_id FROM Race WHERE year=? AND round=?", (year, rnd))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"{year} round {rnd} is not ingested (no Race row)")
+    race_id = row[0]
+
+    round_df = get_session(year, rnd, refresh=True)
+    if round_df is None or round_df.empty:
+        print(f"✖ No session data found for {year} round {rnd}, keeping stored results.")
+        return 0
+    cur.executemany(
+        """
+        UPDATE Driver_Race
+        SET GridPosition = ?, Laps = ?, RaceTime = ?, Status = ?, position = ?, points = ?
+        WHERE race_id = ?
+          AND driver_id = (SELECT driver_id FROM Driver WHERE code = ?)
+        """,
+        [
+            (
+                safe_int(r.get("GridPosition")),
+                safe_int(r.get("Laps")),
+                format_quali_time(r.get("RaceTime")),
+                r.get("Status"),
+                safe_int(r.get("RacePosition")),
+                safe_int(r.get("Points")),
+                race_id,
+                r.get("DriverId"),
+            )
+            for _, r in round_df.iterrows()
+        ],
+    )
+    return cur.rowcount
+
+
+def invalidate_from(year: int, rnd: int, refetch=True):
+    """
+    Recompute driver, constructor and combined Elo for rounds rnd..latest of a season.
+    - ratings as of round rnd-1 are reloaded from Driver_Race / Constructor_Race
+    - refetch=True first re-pulls round rnd's classification (e.g. after a stewards' decision)
+    - every write happens in one transaction, so a failure leaves the season untouched
+    """
+    print(f"\n=== Recomputing {year} Elo from round {rnd} ===")
+    conn = sqlite3.connect(DB_FILE)
+    cur = conn.cursor()
+    migrate(conn, verbose=False)
+
+    try:
+        if conn.execute("SELECT 1 FROM Race WHERE year=? AND round=?", (year, rnd)).fetchone() is None:
+            print(f"✖ {year} round {rnd} is not ingested (no Race row); run update.py or database_init.py first.")
+            return
+
+        if refetch:
+            print(f"📡 Refreshing round {rnd} classification...")
+            refresh_round_results(cur, year, rnd)
+
+        results = get_results_from(conn, year, rnd)
+        if results.empty:
+            print(f"No stored results for {year} from round {rnd}.")
+            conn.rollback()
+            return
+
+        latest = int(results["Round"].max())
+        (drv_labels, drv_elo), (con_labels, con_elo), (cmb_labels, cmb_elo) = get_ratings_before(conn, year, rnd)
+        driver = RatingStore("DriverId", latest, ["FirstName", "LastName"])
+        driver.restore(drv_labels, drv_elo)
+        constructor = RatingStore("ConstructorName", latest)
+        constructor.restore(con_labels, con_elo)
+        combined = RatingStore("DriverId", latest, ["FirstName", "LastName"])
+        combined.restore(cmb_labels, cmb_elo)
+
+        driver_rows, constructor_rows = [], {}
+        for round_number in range(rnd, latest + 1):
+            res = results[results["Round"] == round_number]
+            if res.empty:
+                for store in (driver, constructor, combined):
+                    store.carry_forward(round_number)
+                continue
+            constructor.update(round_number, res)
+            combined.update(round_number, res, constructor.lookup(res["ConstructorName"]))
+            driver.update(round_number, res)
+
+            drv_now = driver.lookup(res["DriverId"])
+            cmb_now = combined.lookup(res["DriverId"])
+            con_now = constructor.lookup(res["ConstructorName"])
+            for i, r in enumerate(res.itertuples(index=False)):
+                driver_rows.append((safe_int(drv_now[i]), safe_int(cmb_now[i]), r.race_id, r.driver_id))
+                constructor_rows[(r.race_id, r.constructor_id)] = safe_int(con_now[i])
+
+        cur.executemany(
+            "UPDATE Driver_Race SET elo = ?, combined_elo = ? WHERE race_id = ? AND driver_id = ?",
+            driver_rows,
+        )
+        cur.executemany(
+            "UPDATE Constructor_Race SET elo = ? WHERE race_id = ? AND constructor_id = ?",
+            [(elo, race_id, constructor_id) for (race_id, constructor_id), elo in constructor_rows.items()],
+        )
+        update_latest_rating(conn, results["race_id"].unique().tolist())
+        conn.commit()
+        # replay checkpoints from this season on were built from the old results
+        drop_checkpoints(year)
+        print(f"✅ Rewrote Elo for rounds {rnd}-{latest} ({len(driver_rows)} driver rows, {len(constructor_rows)} constructor rows)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
+    install_ingest_hooks()
+    # python app/api_retrival/update.py invalidate <year> <round>
+    if len(sys.argv) == 4 and sys.argv[1] == "invalidate":
+        invalidate_from(int(sys.argv[2]), int(sys.argv[3]))
+        sys.exit(0)
+
     current_year = datetime.now().year
     # Check current season and peek at next season (no-ops if no past rounds yet)
     for yr in (current_year, current_year + 1):
@@ -5,7 +5,9 @@ import fastf1.ergast
 import os
 import json
 import pandas as pd
+import numpy as np
 import sqlite3
+import threading
 from datetime import datetime
 
 # Enable cache
@@ -19,13 +21,94 @@ CORS(app)  # Enable CORS for all routes
 ergast = fastf1.ergast.Ergast()
 
 # Prediction DB (tyre degradation + qualifying data)
-DB_PATH = os.path.join(os.path.dirname(__file__), "api_retrival", "database", "f1_data.db")
+DB_PATH = os.environ.get("F1_DB_PATH", os.path.join(os.path.dirname(__file__), "api_retrival", "database", "f1_data.db"))
+
+
+# ==========================
+# Read-only connection pool
+# ==========================
+# Each gunicorn worker keeps a few long-lived read-only connections, so prepared
+# statements stay cached between requests. In WAL mode update.py / new.py can
+# write while the dashboard reads; busy_timeout covers the brief checkpoint locks.
+DB_POOL_SIZE = int(os.environ.get("F1_DB_POOL_SIZE", 8))
+DB_BUSY_TIMEOUT = float(os.environ.get("F1_DB_BUSY_TIMEOUT", 10.0))
+DB_CACHED_STATEMENTS = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection whose close() hands it back to its pool instead of closing it."""
+    pool = None
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+
+class ConnectionPool:
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.idle = []
+
+    def open(self):
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, timeout=self.timeout,
+            cached_statements=DB_CACHED_STATEMENTS, check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = 1")
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        with self.lock:
+            if os.getpid() != self.pid:
+                # forked (gunicorn --preload): connections can't cross processes, start over
+                self.pid, self.idle = os.getpid(), []
+            if self.idle:
+                return self.idle.pop()
+        return self.open()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            if os.getpid() != self.pid or len(self.idle) >= self.size:
+                conn.pool = None
+                return False
+            self.idle.append(conn)
+            return True
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+
+
+def enable_wal(path=DB_PATH):
+    """Switch the database to WAL (persists in the file); skipped if it can't be written."""
+    try:
+        conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT)
+        try:
+            return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ Could not enable WAL on {path}: {e}")
+
+
+enable_wal()
+db_pool = ConnectionPool(DB_PATH)
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_pool.acquire()
 
 
 def rows_to_dict_list(cursor_rows):
@@ -410,62 +493,77 @@ def get_driver_elo_rankings():
         year = request.args.get('season', type=int)
         round_num = request.args.get('race', type=int)
         conn = get_db_connection()
-
-        if year and round_num:
-            query = """
-                SELECT
-                    d.driver_id, d.first_name, d.last_name, d.code,
-                    c.constructor_id, c.name as constructor_name, dr.elo
-                FROM Driver_Race dr
-                JOIN Driver d ON dr.driver_id = d.driver_id
-                JOIN Constructor c ON dr.constructor_id = c.constructor_id
-                JOIN Race r ON dr.race_id = r.race_id
-                WHERE r.year = ? AND r.round = ?
-                ORDER BY dr.elo DESC;
-            """
-            drivers = conn.execute(query, (year, round_num)).fetchall()
-        elif year:
-            query = """
-                SELECT
-                    d.driver_id, d.first_name, d.last_name, d.code,
-                    c.constructor_id, c.name as constructor_name, dr.elo
-                FROM
-                    Driver d
-                JOIN
-                    (SELECT
-                        dr.driver_id, dr.constructor_id, dr.elo,
-                        ROW_NUMBER() OVER(PARTITION BY dr.driver_id ORDER BY r.round DESC) as rn
-                     FROM Driver_Race dr
-                     JOIN Race r ON dr.race_id = r.race_id
-                     WHERE r.year = ?) dr ON d.driver_id = dr.driver_id
-                JOIN Constructor c ON dr.constructor_id = c.constructor_id
-                WHERE
-                    dr.rn = 1
-                ORDER BY
-                    dr.elo DESC;
-            """
-            drivers = conn.execute(query, (year,)).fetchall()
-        else:
-            query = """
-                SELECT
-                    d.driver_id, d.first_name, d.last_name, d.code,
-                    c.constructor_id, c.name as constructor_name, dr.elo
-                FROM
-                    Driver d
-                JOIN
-                    (SELECT
-                        driver_id, constructor_id, elo,
-                        ROW_NUMBER() OVER(PARTITION BY driver_id ORDER BY race_id DESC) as rn
-                     FROM Driver_Race) dr ON d.driver_id = dr.driver_id
-                JOIN Constructor c ON dr.constructor_id = c.constructor_id
-                WHERE
-                    dr.rn = 1
-                ORDER BY
-                    dr.elo DESC;
-            """
-            drivers = conn.execute(query).fetchall()
-
-        conn.close()
+        try:
+            if year and round_num:
+                query = """
+                    SELECT
+                        d.driver_id, d.first_name, d.last_name, d.code,
+                        c.constructor_id, c.name as constructor_name, dr.elo
+                    FROM Driver_Race dr
+                    JOIN Driver d ON dr.driver_id = d.driver_id
+                    JOIN Constructor c ON dr.constructor_id = c.constructor_id
+                    JOIN Race r ON dr.race_id = r.race_id
+                    WHERE r.year = ? AND r.round = ?
+                    ORDER BY dr.elo DESC;
+                """
+                drivers = conn.execute(query, (year, round_num)).fetchall()
+            elif year:
+                query = """
+                    SELECT
+                        d.driver_id, d.first_name, d.last_name, d.code,
+                        c.constructor_id, c.name as constructor_name, dr.elo
+                    FROM
+                        Driver d
+                    JOIN
+                        (SELECT
+                            dr.driver_id, dr.constructor_id, dr.elo,
+                            ROW_NUMBER() OVER(PARTITION BY dr.driver_id ORDER BY r.round DESC) as rn
+                         FROM Driver_Race dr
+                         JOIN Race r ON dr.race_id = r.race_id
+                         WHERE r.year = ?) dr ON d.driver_id = dr.driver_id
+                    JOIN Constructor c ON dr.constructor_id = c.constructor_id
+                    WHERE
+                        dr.rn = 1
+                    ORDER BY
+                        dr.elo DESC;
+                """
+                drivers = conn.execute(query, (year,)).fetchall()
+            else:
+                query = """
+                    SELECT
+                        d.driver_id, d.first_name, d.last_name, d.code,
+                        c.constructor_id, c.name as constructor_name, lr.elo
+                    FROM Latest_Rating lr
+                    JOIN Driver d ON lr.entity_id = d.driver_id
+                    JOIN Constructor c ON lr.constructor_id = c.constructor_id
+                    WHERE lr.entity_type = 'driver'
+                    ORDER BY lr.elo DESC;
+                """
+                try:
+                    drivers = conn.execute(query).fetchall()
+                except sqlite3.OperationalError:
+                    # Latest_Rating not built on this DB yet: scan Driver_Race instead
+                    query = """
+                        SELECT
+                            d.driver_id, d.first_name, d.last_name, d.code,
+                            c.constructor_id, c.name as constructor_name, dr.elo
+                        FROM
+                            Driver d
+                        JOIN
+                            (SELECT
+                                driver_id, constructor_id, elo,
+                                ROW_NUMBER() OVER(PARTITION BY driver_id ORDER BY race_id DESC) as rn
+                             FROM Driver_Race) dr ON d.driver_id = dr.driver_id
+                        JOIN Constructor c ON dr.constructor_id = c.constructor_id
+                        WHERE
+                            dr.rn = 1
+                        ORDER BY
+                            dr.elo DESC;
+                    """
+                    drivers = conn.execute(query).fetchall()
+
+        finally:
+            conn.close()
         return jsonify(rows_to_dict_list(drivers))
     except Exception as e:
         print(f"Error in driver Elo rankings: {e}")
@@ -479,61 +577,77 @@ def get_combined_elo_rankings():
         year = request.args.get('season', type=int)
         round_num = request.args.get('race', type=int)
         conn = get_db_connection()
-
-        if year and round_num:
-            query = """
-                SELECT
-                    d.driver_id, d.first_name, d.last_name,
-                    c.constructor_id, c.name as constructor_name,
-                    dr.combined_elo
-                FROM Driver_Race dr
-                JOIN Driver d ON dr.driver_id = d.driver_id
-                JOIN Constructor c ON dr.constructor_id = c.constructor_id
-                JOIN Race r ON dr.race_id = r.race_id
-                WHERE r.year = ? AND r.round = ?
-                ORDER BY dr.combined_elo DESC;
-            """
-            rankings = conn.execute(query, (year, round_num)).fetchall()
-        elif year:
-            query = """
-                SELECT
-                    d.driver_id, d.first_name, d.last_name,
-                    c.constructor_id, c.name as constructor_name,
-                    dr.combined_elo
-                FROM Driver_Race dr
-                JOIN Driver d ON dr.driver_id = d.driver_id
-                JOIN Constructor c ON dr.constructor_id = c.constructor_id
-                JOIN Race r ON dr.race_id = r.race_id
-                JOIN (
-                    SELECT dr.driver_id, MAX(r.round) as max_round
+        try:
+            if year and round_num:
+                query = """
+                    SELECT
+                        d.driver_id, d.first_name, d.last_name,
+                        c.constructor_id, c.name as constructor_name,
+                        dr.combined_elo
+                    FROM Driver_Race dr
+                    JOIN Driver d ON dr.driver_id = d.driver_id
+                    JOIN Constructor c ON dr.constructor_id = c.constructor_id
+                    JOIN Race r ON dr.race_id = r.race_id
+                    WHERE r.year = ? AND r.round = ?
+                    ORDER BY dr.combined_elo DESC;
+                """
+                rankings = conn.execute(query, (year, round_num)).fetchall()
+            elif year:
+                query = """
+                    SELECT
+                        d.driver_id, d.first_name, d.last_name,
+                        c.constructor_id, c.name as constructor_name,
+                        dr.combined_elo
                     FROM Driver_Race dr
+                    JOIN Driver d ON dr.driver_id = d.driver_id
+                    JOIN Constructor c ON dr.constructor_id = c.constructor_id
                     JOIN Race r ON dr.race_id = r.race_id
+                    JOIN (
+                        SELECT dr.driver_id, MAX(r.round) as max_round
+                        FROM Driver_Race dr
+                        JOIN Race r ON dr.race_id = r.race_id
+                        WHERE r.year = ?
+                        GROUP BY dr.driver_id
+                    ) latest ON dr.driver_id = latest.driver_id AND r.round = latest.max_round
                     WHERE r.year = ?
-                    GROUP BY dr.driver_id
-                ) latest ON dr.driver_id = latest.driver_id AND r.round = latest.max_round
-                WHERE r.year = ?
-                ORDER BY dr.combined_elo DESC;
-            """
-            rankings = conn.execute(query, (year, year)).fetchall()
-        else:
-            query = """
-                SELECT
-                    d.driver_id, d.first_name, d.last_name,
-                    c.constructor_id, c.name as constructor_name,
-                    dr.combined_elo
-                FROM Driver_Race dr
-                JOIN Driver d ON dr.driver_id = d.driver_id
-                JOIN Constructor c ON dr.constructor_id = c.constructor_id
-                JOIN (
-                    SELECT driver_id, MAX(race_id) as max_race_id
-                    FROM Driver_Race
-                    GROUP BY driver_id
-                ) latest ON dr.driver_id = latest.driver_id AND dr.race_id = latest.max_race_id
-                ORDER BY dr.combined_elo DESC;
-            """
-            rankings = conn.execute(query).fetchall()
-
-        conn.close()
+                    ORDER BY dr.combined_elo DESC;
+                """
+                rankings = conn.execute(query, (year, year)).fetchall()
+            else:
+                query = """
+                    SELECT
+                        d.driver_id, d.first_name, d.last_name,
+                        c.constructor_id, c.name as constructor_name,
+                        lr.combined_elo
+                    FROM Latest_Rating lr
+                    JOIN Driver d ON lr.entity_id = d.driver_id
+                    JOIN Constructor c ON lr.constructor_id = c.constructor_id
+                    WHERE lr.entity_type = 'driver'
+                    ORDER BY lr.combined_elo DESC;
+                """
+                try:
+                    rankings = conn.execute(query).fetchall()
+                except sqlite3.OperationalError:
+                    # Latest_Rating not built on this DB yet: scan Driver_Race instead
+                    query = """
+                        SELECT
+                            d.driver_id, d.first_name, d.last_name,
+                            c.constructor_id, c.name as constructor_name,
+                            dr.combined_elo
+                        FROM Driver_Race dr
+                        JOIN Driver d ON dr.driver_id = d.driver_id
+                        JOIN Constructor c ON dr.constructor_id = c.constructor_id
+                        JOIN (
+                            SELECT driver_id, MAX(race_id) as max_race_id
+                            FROM Driver_Race
+                            GROUP BY driver_id
+                        ) latest ON dr.driver_id = latest.driver_id AND dr.race_id = latest.max_race_id
+                        ORDER BY dr.combined_elo DESC;
+                    """
+                    rankings = conn.execute(query).fetchall()
+
+        finally:
+            conn.close()
         return jsonify(rows_to_dict_list(rankings))
     except Exception as e:
         print(f"Error in combined Elo rankings: {e}")
@@ -546,20 +660,22 @@ def get_driver_elo_history(driver_id):
     try:
         year_filter = request.args.get('season', type=int)
         conn = get_db_connection()
-        base_query = """
-            SELECT
-                r.year, r.round, r.name AS race_name, r.date, dr.elo
-            FROM Driver_Race dr
-            JOIN Race r ON dr.race_id = r.race_id
-            WHERE dr.driver_id = ?
-        """
-        params = [driver_id]
-        if year_filter:
-            base_query += " AND r.year = ?"
-            params.append(year_filter)
-        base_query += " ORDER BY r.year, r.round;"
-        history = conn.execute(base_query, tuple(params)).fetchall()
-        conn.close()
+        try:
+            base_query = """
+                SELECT
+                    r.year, r.round, r.name AS race_name, r.date, dr.elo
+                FROM Driver_Race dr
+                JOIN Race r ON dr.race_id = r.race_id
+                WHERE dr.driver_id = ?
+            """
+            params = [driver_id]
+            if year_filter:
+                base_query += " AND r.year = ?"
+                params.append(year_filter)
+            base_query += " ORDER BY r.year, r.round;"
+            history = conn.execute(base_query, tuple(params)).fetchall()
+        finally:
+            conn.close()
         return jsonify(rows_to_dict_list(history))
     except Exception as e:
         print(f"Error in driver Elo history: {e}")
@@ -572,20 +688,22 @@ def get_constructor_elo_history(constructor_id):
     try:
         year_filter = request.args.get('season', type=int)
         conn = get_db_connection()
-        base_query = """
-            SELECT
-                r.year, r.round, r.name AS race_name, r.date, cr.elo
-            FROM Constructor_Race cr
-            JOIN Race r ON cr.race_id = r.race_id
-            WHERE cr.constructor_id = ?
-        """
-        params = [constructor_id]
-        if year_filter:
-            base_query += " AND r.year = ?"
-            params.append(year_filter)
-        base_query += " ORDER BY r.year, r.round;"
-        history = conn.execute(base_query, tuple(params)).fetchall()
-        conn.close()
+        try:
+            base_query = """
+                SELECT
+                    r.year, r.round, r.name AS race_name, r.date, cr.elo
+                FROM Constructor_Race cr
+                JOIN Race r ON cr.race_id = r.race_id
+                WHERE cr.constructor_id = ?
+            """
+            params = [constructor_id]
+            if year_filter:
+                base_query += " AND r.year = ?"
+                params.append(year_filter)
+            base_query += " ORDER BY r.year, r.round;"
+            history = conn.execute(base_query, tuple(params)).fetchall()
+        finally:
+            conn.close()
         return jsonify(rows_to_dict_list(history))
     except Exception as e:
         print(f"Error in constructor Elo history: {e}")
@@ -597,28 +715,30 @@ def compare_drivers(driver1_id, driver2_id):
     """Fetch latest stats for two drivers (DB-based)."""
     try:
         conn = get_db_connection()
-        query = """
-            SELECT
-                d.first_name,
-                d.last_name,
-                d.country,
-                dr.elo,
-                dr.combined_elo,
-                dr.position,
-                dr.points,
-                r.year,
-                r.round,
-                r.name as race_name
-            FROM Driver d
-            JOIN Driver_Race dr ON d.driver_id = dr.driver_id
-            JOIN Race r ON dr.race_id = r.race_id
-            WHERE d.driver_id = ?
-            ORDER BY r.year DESC, r.round DESC
-            LIMIT 1;
-        """
-        driver1_data = conn.execute(query, (driver1_id,)).fetchone()
-        driver2_data = conn.execute(query, (driver2_id,)).fetchone()
-        conn.close()
+        try:
+            query = """
+                SELECT
+                    d.first_name,
+                    d.last_name,
+                    d.country,
+                    dr.elo,
+                    dr.combined_elo,
+                    dr.position,
+                    dr.points,
+                    r.year,
+                    r.round,
+                    r.name as race_name
+                FROM Driver d
+                JOIN Driver_Race dr ON d.driver_id = dr.driver_id
+                JOIN Race r ON dr.race_id = r.race_id
+                WHERE d.driver_id = ?
+                ORDER BY r.year DESC, r.round DESC
+                LIMIT 1;
+            """
+            driver1_data = conn.execute(query, (driver1_id,)).fetchone()
+            driver2_data = conn.execute(query, (driver2_id,)).fetchone()
+        finally:
+            conn.close()
 
         if not driver1_data or not driver2_data:
             return jsonify({"error": "One or both drivers not found"}), 404
@@ -637,23 +757,25 @@ def compare_constructors(constructor1_id, constructor2_id):
     """Fetch latest stats for two constructors (DB-based)."""
     try:
         conn = get_db_connection()
-        query = """
-            SELECT
-                c.name,
-                cr.elo,
-                r.year,
-                r.round,
-                r.name as race_name
-            FROM Constructor c
-            JOIN Constructor_Race cr ON c.constructor_id = cr.constructor_id
-            JOIN Race r ON cr.race_id = r.race_id
-            WHERE c.constructor_id = ?
-            ORDER BY r.year DESC, r.round DESC
-            LIMIT 1;
-        """
-        constructor1_data = conn.execute(query, (constructor1_id,)).fetchone()
-        constructor2_data = conn.execute(query, (constructor2_id,)).fetchone()
-        conn.close()
+        try:
+            query = """
+                SELECT
+                    c.name,
+                    cr.elo,
+                    r.year,
+                    r.round,
+                    r.name as race_name
+                FROM Constructor c
+                JOIN Constructor_Race cr ON c.constructor_id = cr.constructor_id
+                JOIN Race r ON cr.race_id = r.race_id
+                WHERE c.constructor_id = ?
+                ORDER BY r.year DESC, r.round DESC
+                LIMIT 1;
+            """
+            constructor1_data = conn.execute(query, (constructor1_id,)).fetchone()
+            constructor2_data = conn.execute(query, (constructor2_id,)).fetchone()
+        finally:
+            conn.close()
 
         if not constructor1_data or not constructor2_data:
             return jsonify({"error": "One or both constructors not found"}), 404
@@ -672,16 +794,18 @@ def get_available_races(year):
     """Return race names for the given year that have qualifying data in the database."""
     try:
         conn = get_db_connection()
-        query = """
-            SELECT DISTINCT r.name AS race_name
-            FROM Race r
-            JOIN Driver_Race dr ON r.race_id = dr.race_id
-            WHERE r.year = ?
-              AND dr.qualifying_position IS NOT NULL
-            ORDER BY r.round ASC;
-        """
-        df = pd.read_sql_query(query, conn, params=(year,))
-        conn.close()
+        try:
+            query = """
+                SELECT DISTINCT r.name AS race_name
+                FROM Race r
+                JOIN Driver_Race dr ON r.race_id = dr.race_id
+                WHERE r.year = ?
+                  AND dr.qualifying_position IS NOT NULL
+                ORDER BY r.round ASC;
+            """
+            df = pd.read_sql_query(query, conn, params=(year,))
+        finally:
+            conn.close()
 
         races = df["race_name"].tolist()
         return jsonify(races)
@@ -700,22 +824,23 @@ def get_upcoming_races():
         year = request.args.get("year", datetime.now().year, type=int)
         include_next = str(request.args.get("include_next", "1")).lower() in {"1", "true", "yes", "y"}
         conn = get_db_connection()
+        try:
+            def fetch_year(y):
+                query = """
+                    SELECT year, round, name, circuit, date
+                    FROM Race
+                    WHERE year = ? AND date(date) >= date('now')
+                    ORDER BY round ASC;
+                """
+                return pd.read_sql_query(query, conn, params=(y,))
+
+            frames = [fetch_year(year)]
+            if include_next:
+                frames.append(fetch_year(year + 1))
 
-        def fetch_year(y):
-            query = """
-                SELECT year, round, name, circuit, date
-                FROM Race
-                WHERE year = ? AND date(date) >= date('now')
-                ORDER BY round ASC;
-            """
-            return pd.read_sql_query(query, conn, params=(y,))
-
-        frames = [fetch_year(year)]
-        if include_next:
-            frames.append(fetch_year(year + 1))
-
-        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
-        conn.close()
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        finally:
+            conn.close()
 
         # Fallback to Ergast if DB has no future races for requested/next year
         if df.empty:
@@ -830,12 +955,14 @@ def race_predict_from_db():
 
         df = pd.DataFrame()
         conn = get_db_connection()
-        for variant in name_variants:
-            df = pd.read_sql_query(query, conn, params=(year, f"%{variant}%"))
-            if not df.empty:
-                normalized_name = variant
-                break
-        conn.close()
+        try:
+            for variant in name_variants:
+                df = pd.read_sql_query(query, conn, params=(year, f"%{variant}%"))
+                if not df.empty:
+                    normalized_name = variant
+                    break
+        finally:
+            conn.close()
 
         if df.empty:
             return jsonify({"detail": f"No qualifying data found for '{gp_name}' ({'/'.join(name_variants)}) {year}"}), 404
@@ -879,7 +1006,7 @@ def race_predict_from_db():
             axis=1,
         )
 
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT)
         cur = conn.cursor()
         for _, row in df.iterrows():
             cur.execute("""
@@ -926,6 +1053,270 @@ def race_predict_from_db():
         print(f"Prediction generation failed: {e}")
         return jsonify({"error": f"Prediction generation failed: {e}"}), 500
 
+def season_points_table(year):
+    """Points for 1st, 2nd, ... in a given season (fastest-lap, sprint and shared-drive points ignored)."""
+    if year >= 2010:
+        return [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+    if year >= 2003:
+        return [10, 8, 6, 5, 4, 3, 2, 1]
+    if year >= 1991:
+        return [10, 6, 4, 3, 2, 1]
+    if year >= 1961:
+        return [9, 6, 4, 3, 2, 1]
+    if year == 1960:
+        return [8, 6, 4, 3, 2, 1]
+    return [8, 6, 4, 3, 2]
+
+
+def scheduled_rounds(year):
+    """Round numbers on the season's calendar (Ergast, FastF1's event schedule as a fallback)."""
+    try:
+        response = ergast.get_race_schedule(year)
+        df = response.content if hasattr(response, 'content') else response
+        if isinstance(df, list):
+            df = df[0] if df else None
+        if isinstance(df, pd.DataFrame) and not df.empty:
+            return {int(r) for r in df['round']}
+    except Exception as e:
+        print(f"Ergast schedule failed for {year}: {e}")
+    schedule = fastf1.get_event_schedule(year, include_testing=False)
+    return {int(r) for r in schedule['RoundNumber'] if r > 0}
+
+
+def final_position_counts(total, rng):
+    """Count how often each entry finishes in each championship position; random tie-break on equal points."""
+    size, n = total.shape
+    standings = np.argsort(-(total + rng.random(total.shape) * 1e-3), axis=1)
+    return np.bincount((standings * n + np.arange(n)).ravel(), minlength=n * n).reshape(n, n)
+
+
+def simulate_championship(elo, racing, points, teams, team_points, remaining_rounds, points_table, runs, rng, chunk=10000):
+    """
+    Simulate the rest of a season `runs` times in NumPy batches.
+    - Each race, every driver in `racing` gets performance elo*ln(10)/400 + Gumbel noise and
+      finishes in that order. The difference of two Gumbels is logistic, so driver A beats B with
+      probability 1 / (1 + 10**((elo_B - elo_A)/400)), the same as round_elo.determine_win_chance.
+    - Constructor totals are the current team points plus their drivers' simulated points.
+    Returns (driver position counts, driver points sum, team position counts, team points sum).
+    """
+    n, team_count = len(elo), len(team_points)
+    grid = np.flatnonzero(racing)
+    strength = elo[grid] * np.log(10) / 400
+    table = np.zeros(len(grid))
+    scored = min(len(points_table), len(grid))
+    table[:scored] = points_table[:scored]
+    team_onehot = np.zeros((len(grid), team_count))
+    team_onehot[np.arange(len(grid)), teams[grid]] = 1
+
+    driver_counts, driver_points = np.zeros((n, n)), np.zeros(n)
+    team_counts, team_totals = np.zeros((team_count, team_count)), np.zeros(team_count)
+    for start in range(0, runs, chunk):
+        size = min(chunk, runs - start)
+        gained = np.zeros((size, len(grid)))
+        if remaining_rounds and len(grid):
+            performance = strength + rng.gumbel(size=(size, remaining_rounds, len(grid)))
+            finishing_order = np.argsort(-performance, axis=2)
+            race_points = np.zeros(performance.shape)
+            np.put_along_axis(race_points, finishing_order, np.broadcast_to(table, performance.shape), axis=2)
+            gained = race_points.sum(axis=1)
+
+        total = np.tile(points, (size, 1))
+        total[:, grid] += gained
+        driver_counts += final_position_counts(total, rng)
+        driver_points += total.sum(axis=0)
+
+        total = team_points + gained @ team_onehot
+        team_counts += final_position_counts(total, rng)
+        team_totals += total.sum(axis=0)
+    return driver_counts, driver_points, team_counts, team_totals
+
+
+@app.route('/api/simulate/championship', methods=['GET'])
+def simulate_championship_endpoint():
+    """Monte Carlo title / finishing-position probabilities for drivers and constructors from current Elo."""
+    try:
+        year, _ = resolve_year_param(request.args.get('season'))
+        year = int(year)
+        runs = min(max(request.args.get('runs', 10000, type=int), 1), 200000)
+        seed = request.args.get('seed', type=int)
+        conn = get_db_connection()
+        try:
+            # latest rating and points so far for everyone who raced this season
+            drivers = pd.read_sql_query("""
+                SELECT
+                    d.driver_id, d.code, d.first_name, d.last_name,
+                    c.constructor_id, c.name AS constructor_name,
+                    latest.elo, latest.round AS last_round, totals.points
+                FROM (
+                    SELECT dr.driver_id, dr.constructor_id, dr.elo, r.round,
+                           ROW_NUMBER() OVER(PARTITION BY dr.driver_id ORDER BY r.round DESC, dr.driver_race_id DESC) AS rn
+                    FROM Driver_Race dr
+                    JOIN Race r ON dr.race_id = r.race_id
+                    WHERE r.year = ?
+                ) latest
+                JOIN (
+                    SELECT dr.driver_id, SUM(COALESCE(dr.points, 0)) AS points
+                    FROM Driver_Race dr
+                    JOIN Race r ON dr.race_id = r.race_id
+                    WHERE r.year = ?
+                    GROUP BY dr.driver_id
+                ) totals ON latest.driver_id = totals.driver_id
+                JOIN Driver d ON latest.driver_id = d.driver_id
+                JOIN Constructor c ON latest.constructor_id = c.constructor_id
+                WHERE latest.rn = 1;
+            """, conn, params=(year, year))
+
+            constructors = pd.read_sql_query("""
+                SELECT c.constructor_id, c.name AS constructor_name, SUM(COALESCE(dr.points, 0)) AS points
+                FROM Driver_Race dr
+                JOIN Race r ON dr.race_id = r.race_id
+                JOIN Constructor c ON dr.constructor_id = c.constructor_id
+                WHERE r.year = ?
+                GROUP BY c.constructor_id, c.name;
+            """, conn, params=(year,))
+
+            # Race rows only exist once results are in, so the rest of the calendar comes from the schedule
+            stored_rounds = {r for (r,) in conn.execute("""
+                SELECT DISTINCT r.round FROM Race r
+                JOIN Driver_Race dr ON dr.race_id = r.race_id
+                WHERE r.year = ?;
+            """, (year,))}
+        finally:
+            conn.close()
+
+        if drivers.empty:
+            return jsonify({"error": f"No results stored for season {year}"}), 404
+        try:
+            remaining_rounds = len(scheduled_rounds(year) - stored_rounds)
+        except Exception as e:
+            return jsonify({"error": f"Could not load the {year} schedule: {e}"}), 500
+
+        start = datetime.now()
+        elo = drivers["elo"].fillna(1000).to_numpy(dtype=float)
+        # the latest round's field races the remaining rounds; everyone else keeps their points
+        racing = (drivers["last_round"] == drivers["last_round"].max()).to_numpy()
+        constructor_index = {cid: i for i, cid in enumerate(constructors["constructor_id"])}
+        teams = drivers["constructor_id"].map(constructor_index).to_numpy()
+
+        driver_counts, driver_points, team_counts, team_points = simulate_championship(
+            elo, racing, drivers["points"].to_numpy(dtype=float), teams,
+            constructors["points"].to_numpy(dtype=float), remaining_rounds,
+            season_points_table(year), runs, np.random.default_rng(seed),
+        )
+        elapsed = (datetime.now() - start).total_seconds()
+
+        driver_results = []
+        for i, row in enumerate(drivers.itertuples(index=False)):
+            driver_results.append({
+                "driver_id": int(row.driver_id),
+                "code": row.code,
+                "first_name": row.first_name,
+                "last_name": row.last_name,
+                "constructor_name": row.constructor_name,
+                "elo": round(float(elo[i]), 1),
+                "points": float(row.points),
+                "expected_points": round(float(driver_points[i]) / runs, 2),
+                "title_probability": round(float(driver_counts[i, 0]) / runs, 4),
+                "position_probabilities": [round(float(p), 4) for p in driver_counts[i] / runs],
+            })
+        driver_results.sort(key=lambda d: (-d["title_probability"], -d["expected_points"]))
+
+        constructor_results = []
+        for i, row in enumerate(constructors.itertuples(index=False)):
+            constructor_results.append({
+                "constructor_id": int(row.constructor_id),
+                "name": row.constructor_name,
+                "points": float(row.points),
+                "expected_points": round(float(team_points[i]) / runs, 2),
+                "title_probability": round(float(team_counts[i, 0]) / runs, 4),
+                "position_probabilities": [round(float(p), 4) for p in team_counts[i] / runs],
+            })
+        constructor_results.sort(key=lambda c: (-c["title_probability"], -c["expected_points"]))
+
+        return jsonify({
+            "season": year,
+            "runs": runs,
+            "remaining_rounds": int(remaining_rounds),
+            "points_table": season_points_table(year),
+            "elapsed_seconds": round(elapsed, 3),
+            "drivers": driver_results,
+            "constructors": constructor_results,
+        })
+    except Exception as e:
+        print(f"Error in championship simulation: {e}")
+        return jsonify({"error": f"Championship simulation failed: {str(e)}"}), 500
+
+
+@app.route('/api/stints', methods=['GET'])
+def get_stints():
+    """Per-stint tyre data for one race (from the Stint table), grouped by driver; optional driver_id filter."""
+    try:
+        year, _ = resolve_year_param(request.args.get('season'))
+        year = int(year)
+        round_num = request.args.get('race', type=int)
+        driver_id = request.args.get('driver_id', type=int)
+        if round_num is None:
+            return jsonify({"error": "Missing race parameter"}), 400
+
+        conn = get_db_connection()
+        try:
+            rows = conn.execute("""
+                SELECT
+                    r.name AS race_name, d.driver_id, d.code, d.first_name, d.last_name,
+                    c.name AS constructor_name, dr.position,
+                    s.session, s.stint, s.compound, s.start_lap, s.end_lap, s.laps, s.deg_per_lap, s.mean_pace
+                FROM Race r
+                JOIN Driver_Race dr ON dr.race_id = r.race_id
+                JOIN Stint s ON s.driver_race_id = dr.driver_race_id
+                JOIN Driver d ON d.driver_id = dr.driver_id
+                JOIN Constructor c ON c.constructor_id = dr.constructor_id
+                WHERE r.year = ? AND r.round = ? AND (? IS NULL OR dr.driver_id = ?)
+                ORDER BY dr.position IS NULL, dr.position, d.driver_id, s.stint;
+            """, (year, round_num, driver_id, driver_id)).fetchall()
+        except sqlite3.OperationalError as e:
+            # Stint not created on this DB yet (migrations.py hasn't run): no stints stored
+            if "no such table" not in str(e):
+                raise
+            rows = []
+        finally:
+            conn.close()
+
+        if not rows:
+            return jsonify({"detail": f"No stint data for {year} round {round_num}"}), 404
+
+        drivers = {}
+        for row in rows:
+            entry = drivers.setdefault(row["driver_id"], {
+                "driver_id": row["driver_id"],
+                "code": row["code"],
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "constructor_name": row["constructor_name"],
+                "position": row["position"],
+                "session": row["session"],
+                "stints": [],
+            })
+            entry["stints"].append({
+                "stint": row["stint"],
+                "compound": row["compound"],
+                "start_lap": row["start_lap"],
+                "end_lap": row["end_lap"],
+                "laps": row["laps"],
+                "deg_per_lap": row["deg_per_lap"],
+                "mean_pace": row["mean_pace"],
+            })
+
+        return jsonify({
+            "season": year,
+            "round": round_num,
+            "race_name": rows[0]["race_name"],
+            "drivers": list(drivers.values()),
+        })
+    except Exception as e:
+        print(f"Error in stints: {e}")
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})